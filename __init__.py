@@ -3,22 +3,93 @@
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.storage import Store
 
-from .const import DOMAIN, LOGGER
+from .connection import Denon232Connections
+from .coordinator import Denon232Coordinator
+from .denon232_capture import DEFAULT_CAPTURE_SIZE
+from .denon232_transport import DEFAULT_CONNECT_TIMEOUT, DEFAULT_KEEPALIVE
+from .const import (
+    DOMAIN,
+    CONF_CAPTURE,
+    CONF_CAPTURE_SIZE,
+    CONF_DEVICE,
+    CONF_CONNECT_TIMEOUT,
+    CONF_KEEPALIVE,
+    CONF_ZONES,
+    DATA_CONNECTIONS,
+    DATA_COORDINATOR,
+    DATA_RECEIVER,
+    DATA_STORE,
+    STORAGE_SAVE_DELAY,
+    STORAGE_VERSION,
+    LOGGER
+)
 
-PLATFORMS = [Platform.MEDIA_PLAYER]
+PLATFORMS = [Platform.MEDIA_PLAYER, Platform.SENSOR]
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up denon232 media player from ConfigEntry."""
     LOGGER.debug("Setting up Denon232 integration")
     
     hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = entry.data
+    connections = hass.data[DOMAIN].setdefault(DATA_CONNECTIONS, Denon232Connections())
+    
+    # Last known receiver state, so entities don't have to wait for the serial link
+    store = _get_store(hass, entry)
+    snapshot = await store.async_load()
+    
+    try:
+        receiver = await connections.async_acquire(
+            entry.data[CONF_DEVICE],
+            zones=[zone["zone_id"] for zone in entry.data[CONF_ZONES]],
+            snapshot=snapshot,
+            connect_timeout=entry.data.get(CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT),
+            keepalive=entry.data.get(CONF_KEEPALIVE, DEFAULT_KEEPALIVE)
+        )
+    except OSError as exc:
+        raise ConfigEntryNotReady(f"Could not connect to {entry.data[CONF_DEVICE]}: {exc}") from exc
+    
+    # Keep the latest serial traffic for the diagnostics, switched in the options
+    _apply_capture_options(entry, receiver)
+    entry.async_on_unload(entry.add_update_listener(_async_update_options))
+    
+    entry.async_on_unload(receiver.add_listener(
+        lambda changes: store.async_delay_save(receiver.snapshot, STORAGE_SAVE_DELAY)
+    ))
+    
+    # One refresh schedule and change notification for the main and zone entities
+    coordinator = Denon232Coordinator(hass, entry, receiver)
+    entry.async_on_unload(receiver.add_listener(coordinator.async_handle_changes))
+    
+    hass.data[DOMAIN][entry.entry_id] = {
+        **entry.data,
+        DATA_RECEIVER: receiver,
+        DATA_COORDINATOR: coordinator,
+        DATA_STORE: store
+    }
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     
     return True
 
+def _apply_capture_options(entry: ConfigEntry, receiver) -> None:
+    """Start or stop the wire capture as set in the options of an entry."""
+    # Entries created before the options flow kept the switch in their data
+    if entry.options.get(CONF_CAPTURE, entry.data.get(CONF_CAPTURE, False)):
+        receiver.start_capture(entry.options.get(CONF_CAPTURE_SIZE, DEFAULT_CAPTURE_SIZE))
+    elif receiver.capture is not None:
+        receiver.stop_capture()
+
+async def _async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply changed options without reloading the entry."""
+    _apply_capture_options(entry, hass.data[DOMAIN][entry.entry_id][DATA_RECEIVER])
+
+def _get_store(hass: HomeAssistant, entry: ConfigEntry) -> Store:
+    """Return the store holding the receiver state snapshot of an entry."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}")
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     LOGGER.debug("Unloading Denon232 integration")
@@ -26,6 +97,13 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        data = hass.data[DOMAIN].pop(entry.entry_id)
+        # Write the latest state right away, a reload reads it back immediately
+        await data[DATA_STORE].async_save(data[DATA_RECEIVER].snapshot())
+        hass.data[DOMAIN][DATA_CONNECTIONS].release(entry.data[CONF_DEVICE])
     
     return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored state snapshot of a deleted config entry."""
+    await _get_store(hass, entry).async_remove()
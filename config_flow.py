@@ -2,20 +2,34 @@
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.core import callback
 
 from .const import (
     DOMAIN,
+    CONF_CAPTURE,
+    CONF_CAPTURE_SIZE,
     CONF_DEVICE,
+    CONF_CONNECT_TIMEOUT,
+    CONF_KEEPALIVE,
     CONF_NAME,
     CONF_ZONES,
     CONF_ZONE_SETUP,
     CONF_ZONE_NAME,
+    DATA_CONNECTIONS,
     LOGGER
 )
-from .denon232_receiver import Denon232Receiver
+from .denon232_capture import DEFAULT_CAPTURE_SIZE
+from .denon232_protocol import ZONE_IDS, zones_from_replies
+from .denon232_receiver import ZONE_DISCOVERY_MAX_AGE, probe
+from .denon232_transport import DEFAULT_CONNECT_TIMEOUT, DEFAULT_KEEPALIVE
 
+# The timeouts only matter for network serial bridges (socket:// or rfc2217://)
 USER_SCHEMA = vol.Schema(
-    {vol.Required(CONF_DEVICE): str}
+    {
+        vol.Required(CONF_DEVICE): str,
+        vol.Optional(CONF_CONNECT_TIMEOUT, default=DEFAULT_CONNECT_TIMEOUT): vol.All(int, vol.Range(min=1)),
+        vol.Optional(CONF_KEEPALIVE, default=DEFAULT_KEEPALIVE): vol.All(int, vol.Range(min=0))
+    }
 )
 
 SETUP_SCHEMA = vol.Schema(
@@ -37,33 +51,49 @@ class Denon232ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Return the options flow."""
+        return Denon232OptionsFlow()
+
     def __init__(self) -> None:
         """Initialize the Denon AVR flow."""
-        self.device = None
         self.data = {}
         self.zones = []
         self.data[CONF_ZONES] = []
 
-    def determine_zones(self):
-        """Attempt to find the available zones and their identifiers."""
-        LOGGER.debug("Determining available zones")
-        zones = []
+    async def async_query(self, queries):
+        """
+        Send status queries to the device and return the replies per query.
         
-        # Try to detect Zone 2
-        LOGGER.debug("Checking zone 2 capability")
-        if len(self.device.serial_command('Z2?', response=True, all_lines=True, update_state=False)) > 0:
-            zones.append('Z2')
-            LOGGER.debug("Found zone 2 with zone id Z2")
+        A receiver that is already connected on the port is used as is,
+        otherwise the port is probed briefly from the executor.
+        """
+        connections = self.hass.data.get(DOMAIN, {}).get(DATA_CONNECTIONS)
+        if connections is not None and (receiver := connections.get(self.data[CONF_DEVICE])):
+            return {
+                query: await receiver.serial_command(query, response=True, all_lines=True, update_state=False)
+                for query in queries
+            }
+        return await self.hass.async_add_executor_job(probe, self.data[CONF_DEVICE], queries)
+
+    async def determine_zones(self):
+        """
+        Attempt to find the available zones and their identifiers.
         
-        # Try to detect Zone 3 (or alternative Zone 1)
-        LOGGER.debug("Checking zone 3 capability")
-        if len(self.device.serial_command('Z3?', response=True, all_lines=True, update_state=False)) > 0:
-            zones.append('Z3')
-            LOGGER.debug("Found zone 3 with zone id Z3")
-        elif len(self.device.serial_command('Z1?', response=True, all_lines=True, update_state=False)) > 0:
-            zones.append('Z1')
-            LOGGER.debug("Found zone 3 with zone id Z1")
-
+        A receiver already connected on the port offers the zones its last
+        discovery found, if recent enough, without probing.
+        """
+        LOGGER.debug("Determining available zones")
+        connections = self.hass.data.get(DOMAIN, {}).get(DATA_CONNECTIONS)
+        if connections is not None and (receiver := connections.get(self.data[CONF_DEVICE])):
+            if (zones := receiver.known_zones(ZONE_DISCOVERY_MAX_AGE)) is not None:
+                LOGGER.debug("Known zones: %s", zones)
+                return zones
+        
+        zones = zones_from_replies(await self.async_query([f'{zone_id}?' for zone_id in ZONE_IDS]))
+        LOGGER.debug("Found zones: %s", zones)
         return zones
 
     async def async_step_user(self, user_input=None, errors=None):
@@ -71,12 +101,14 @@ class Denon232ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         if user_input is not None:
             if device := user_input[CONF_DEVICE]:
                 try:
-                    self.device = Denon232Receiver(device)
+                    self.data[CONF_DEVICE] = device
+                    self.data[CONF_CONNECT_TIMEOUT] = user_input[CONF_CONNECT_TIMEOUT]
+                    self.data[CONF_KEEPALIVE] = user_input[CONF_KEEPALIVE]
                     # Check if device is responsive and supports the protocol
-                    response = self.device.serial_command('PW?', response=True, update_state=False)
+                    lines = (await self.async_query(['PW?']))['PW?']
+                    response = lines[0] if lines else None
                     
                     if response in ['PWSTANDBY', 'PWON']:
-                        self.data[CONF_DEVICE] = device
                         return await self.async_step_setup()
                     else:
                         LOGGER.error(f"Unexpected response from device: {response}")
@@ -99,8 +131,12 @@ class Denon232ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             await self.async_set_unique_id(self.data[CONF_NAME])
             self._abort_if_unique_id_configured()
 
-            # Discover zones
-            self.zones = await self.hass.async_add_executor_job(self.determine_zones)
+            # Discover zones, SerialException and Denon232ConnectionError are OSErrors
+            try:
+                self.zones = await self.determine_zones()
+            except OSError as exc:
+                LOGGER.error("Error determining zones: %s", exc)
+                return await self.async_step_setup(errors={"base": "connection_error"})
             
             if user_input.get(CONF_ZONE_SETUP, False) and self.zones:
                 return await self.async_step_zone()
@@ -127,3 +163,29 @@ class Denon232ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 return self.async_create_entry(title=self.data[CONF_NAME], data=self.data)
 
         return self.async_show_form(step_id="zone", data_schema=ZONE_SCHEMA, errors=errors)
+
+class Denon232OptionsFlow(config_entries.OptionsFlow):
+    """
+    Denon232 options flow.
+
+    With capture the latest serial traffic is included in the diagnostics,
+    it starts and stops without reloading the entry.
+    """
+
+    async def async_step_init(self, user_input=None):
+        """Manage the capture options."""
+        if user_input is not None:
+            return self.async_create_entry(data=user_input)
+
+        options = self.config_entry.options
+        schema = vol.Schema(
+            {
+                vol.Optional(
+                    CONF_CAPTURE, default=options.get(CONF_CAPTURE, self.config_entry.data.get(CONF_CAPTURE, False))
+                ): bool,
+                vol.Optional(
+                    CONF_CAPTURE_SIZE, default=options.get(CONF_CAPTURE_SIZE, DEFAULT_CAPTURE_SIZE)
+                ): vol.All(int, vol.Range(min=10, max=100000))
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=schema)
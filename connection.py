@@ -0,0 +1,97 @@
+"""Shared receiver connections for the Denon232 integration."""
+import asyncio
+
+from .const import LOGGER
+from .denon232_receiver import DEFAULT_CONFIRM_TIMEOUT, AsyncDenon232Receiver
+from .denon232_transport import DEFAULT_CONNECT_TIMEOUT, DEFAULT_KEEPALIVE
+
+class Denon232Connections(object):
+    """Receivers shared by every config entry and config flow using the same port."""
+
+    def __init__(self):
+        """Initialize the connection registry."""
+        self._receivers = {}
+        self._options = {}  # Connection options each receiver was opened with
+        self._refcounts = {}
+        self._initial_syncs = {}
+        self._opening = {}  # Futures done once the port's receiver is connected or failed to
+
+
+    def get(self, serial_port):
+        """Return the open receiver for a port, or None."""
+        return self._receivers.get(serial_port)
+
+    async def async_acquire(self, serial_port, zones=None, snapshot=None,
+                            connect_timeout=DEFAULT_CONNECT_TIMEOUT, keepalive=DEFAULT_KEEPALIVE):
+        """
+        Return the receiver for a port, connecting it for the first user.
+        
+        A new connection starts out with the state from the snapshot, if any.
+        Its state sync runs in the background and only covers the fields the
+        snapshot doesn't hold recently enough. The receiver's listeners see each
+        field as it arrives. Set commands wait for the receiver to confirm
+        them. Later users add their zones and any state their snapshot holds
+        that the receiver hasn't confirmed yet. The connection options of the
+        first user apply.
+        Users of other ports don't wait for the connect, users of the same
+        port wait for it and then share the receiver, or try again themselves
+        if it failed.
+        Every call has to be matched by a call to release.
+        """
+        while (opening := self._opening.get(serial_port)) is not None:
+            await asyncio.wait([opening])
+        
+        receiver = self._receivers.get(serial_port)
+        if receiver is None:
+            LOGGER.debug("Opening receiver connection on %s", serial_port)
+            receiver = AsyncDenon232Receiver(
+                serial_port, zones=zones, connect_timeout=connect_timeout, keepalive=keepalive,
+                confirm_timeout=DEFAULT_CONFIRM_TIMEOUT
+            )
+            if snapshot:
+                receiver.restore(snapshot)
+            opening = self._opening[serial_port] = asyncio.get_running_loop().create_future()
+            try:
+                await receiver.connect()
+            finally:
+                del self._opening[serial_port]
+                opening.set_result(None)
+            self._receivers[serial_port] = receiver
+            self._options[serial_port] = (connect_timeout, keepalive)
+            self._refcounts[serial_port] = 0
+            self._initial_syncs[serial_port] = asyncio.get_running_loop().create_task(
+                self._async_initial_sync(serial_port, receiver, bool(snapshot))
+            )
+        else:
+            if (connect_timeout, keepalive) != self._options[serial_port]:
+                LOGGER.warning(
+                    "Receiver on %s is already open, the connection options it was opened with apply",
+                    serial_port
+                )
+            receiver.add_zones(zones or [])
+            if snapshot:
+                receiver.restore(snapshot)
+        
+        self._refcounts[serial_port] += 1
+        return receiver
+
+    def release(self, serial_port):
+        """Drop one reference to a port's receiver, closing it once unused."""
+        self._refcounts[serial_port] -= 1
+        if self._refcounts[serial_port] == 0:
+            LOGGER.debug("Closing receiver connection on %s", serial_port)
+            del self._refcounts[serial_port]
+            del self._options[serial_port]
+            self._initial_syncs.pop(serial_port).cancel()
+            self._receivers.pop(serial_port).close()
+
+    async def _async_initial_sync(self, serial_port, receiver, restored):
+        """Get the initial state of a newly connected receiver."""
+        try:
+            if restored:
+                await receiver.refresh()
+            else:
+                await receiver.initialize_state()
+        except Exception as exc:
+            # The periodic refresh picks up whatever is still missing
+            LOGGER.warning("Initial state sync of receiver on %s failed: %s", serial_port, exc)
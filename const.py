@@ -10,6 +10,18 @@ CONF_NAME = "device_name"
 CONF_ZONES = "device_zones"
 CONF_ZONE_SETUP = "zone_setup"
 CONF_ZONE_NAME = "zone_name"
+CONF_CONNECT_TIMEOUT = "connect_timeout"
+CONF_KEEPALIVE = "keepalive"
+CONF_CAPTURE = "capture"
+CONF_CAPTURE_SIZE = "capture_size"
+
+DATA_CONNECTIONS = "connections"
+DATA_COORDINATOR = "coordinator"
+DATA_RECEIVER = "receiver"
+DATA_STORE = "store"
+
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 10  # Seconds to collect state changes before writing the snapshot
 
 RECEIVER_INPUTS = {
     "PHONO": "PHONO",
@@ -0,0 +1,122 @@
+"""Update coordinator for the Denon232 integration."""
+from datetime import timedelta
+import time
+
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .const import DOMAIN, LOGGER
+from .denon232_receiver import DEFAULT_REFRESH_INTERVAL
+
+# Refresh intervals in seconds, picked by Denon232Coordinator.next_interval
+ACTIVE_INTERVAL = 5  # Shortly after changes made elsewhere, or commands that aren't confirmed
+ACTIVE_WINDOW = 60  # Seconds after such activity the short interval applies
+ON_INTERVAL = DEFAULT_REFRESH_INTERVAL  # Unit on, some activity within QUIET_AFTER
+QUIET_AFTER = 30 * 60  # Seconds without activity after which a unit that is on counts as quiet
+QUIET_INTERVAL = 5 * 60  # Unit on but quiet, or in standby
+PUSH_HEALTHY_WINDOW = 10 * 60  # Seconds a pushed status line vouches for the push path
+
+# Passed on after every refresh, which changes the link statistics even when
+# the receiver state stays the same. No zone id, so the media players skip it.
+LINK_CHANGES = {"link": {}}
+
+class Denon232Coordinator(DataUpdateCoordinator):
+    """
+    Refresh schedule and change fan-out for one receiver.
+
+    The receiver reports every state change, whether from a command, a query
+    reply or a status line it sent on its own. The coordinator passes them on
+    to the main and zone entities along with the changed fields, and refreshes
+    whatever went stale once per interval for all of them together. After
+    each refresh it passes on LINK_CHANGES for the link statistics.
+    """
+
+    def __init__(self, hass, config_entry, receiver):
+        """Initialize the coordinator for a connected receiver."""
+        super().__init__(
+            hass,
+            LOGGER,
+            config_entry=config_entry,
+            name=f"{DOMAIN} {config_entry.title}",
+            update_interval=timedelta(seconds=DEFAULT_REFRESH_INTERVAL),
+            # Changes reach the entities through async_handle_changes already
+            always_update=False
+        )
+        self.receiver = receiver
+        self.data = receiver.state
+        self.changes = {}  # Fields changed by the update being passed on, per zone id
+        self.interval_reason = None  # Why the current refresh interval was picked
+        self._async_update_interval(reschedule=False)
+
+    def next_interval(self):
+        """
+        Return the seconds until the next refresh and why.
+        
+        Shortly after changes made elsewhere, e.g. on the front panel, the
+        state is refreshed quickly to catch any side effects. Commands only
+        count when the receiver doesn't confirm them on its own. While
+        the receiver keeps pushing status lines on its own polling pauses, as
+        the push path proves it would report changes. Otherwise a unit that is
+        in standby or hasn't seen activity for a while is polled rarely.
+        """
+        receiver = self.receiver
+        now = time.monotonic()
+        activity = max(receiver.last_command or 0, receiver.last_external_change or 0)
+        # Confirmed commands query what the receiver didn't echo themselves
+        recent = receiver.last_external_change if receiver.confirm_timeout else activity
+        
+        if not receiver.available:
+            # The receiver resyncs on its own once the link is back
+            return QUIET_INTERVAL, "link down"
+        if recent and now - recent < ACTIVE_WINDOW:
+            return ACTIVE_INTERVAL, "active"
+        if receiver.last_push and now - receiver.last_push < PUSH_HEALTHY_WINDOW:
+            # Check again once the push path would no longer count as healthy
+            return max(ACTIVE_INTERVAL, receiver.last_push + PUSH_HEALTHY_WINDOW - now), "push healthy"
+        if receiver.state.power != 'PWON':
+            return QUIET_INTERVAL, "standby"
+        if not activity or now - activity > QUIET_AFTER:
+            return QUIET_INTERVAL, "quiet"
+        return ON_INTERVAL, "on"
+
+    @callback
+    def _async_update_interval(self, reschedule=True):
+        """Pick the refresh interval, with reschedule the pending refresh is moved up when it got shorter."""
+        seconds, self.interval_reason = self.next_interval()
+        previous = self.update_interval
+        self.update_interval = timedelta(seconds=seconds)
+        if reschedule and self.update_interval < previous and self._listeners:
+            self._schedule_refresh()
+
+    @callback
+    def async_handle_changes(self, changes):
+        """Pass a state change of the receiver on to the entities."""
+        self._async_update_interval()
+        self._async_pass_on(changes)
+
+    @callback
+    def _async_pass_on(self, changes):
+        """Update the listeners, with changes set while they run."""
+        self.changes = changes
+        try:
+            self.async_update_listeners()
+        finally:
+            self.changes = {}
+
+    async def _async_update_data(self):
+        """Query the fields that went stale."""
+        try:
+            # The receiver resyncs on its own once a lost link is back
+            if self.receiver.available:
+                try:
+                    await self.receiver.refresh(min(self.update_interval.total_seconds(), DEFAULT_REFRESH_INTERVAL))
+                except OSError as exc:
+                    raise UpdateFailed(f"Refreshing the receiver state failed: {exc}") from exc
+                finally:
+                    # The next refresh is scheduled once this one is done
+                    self._async_update_interval(reschedule=False)
+        finally:
+            # The state stays the same object, so the coordinator itself
+            # never sees new data and wouldn't update the listeners
+            self._async_pass_on(LINK_CHANGES)
+        return self.receiver.state
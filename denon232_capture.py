@@ -0,0 +1,87 @@
+"""
+Capture of the raw traffic on a receiver's serial link.
+
+Every frame written to the receiver and every chunk read from it is kept with
+its monotonic timestamp in a bounded ring buffer. A capture can be dumped to
+a compact text format, one frame per line:
+
+    # denon232 capture v1 2026-10-17T12:00:00+00:00
+    0.000 > PW?\\r
+    0.031 < PWON\\r
+
+The first column holds the seconds since the first frame kept, > marks data
+sent to the receiver and < data received from it. The bytes are escaped like
+Python string literals, so control characters stay on one line. Received
+data is kept per line rather than per read.
+"""
+import codecs
+import collections
+import datetime
+import time
+
+DEFAULT_CAPTURE_SIZE = 2000  # Frames kept, the oldest are dropped first
+CAPTURE_HEADER = '# denon232 capture v1'
+
+TX = '>'  # Written to the receiver
+RX = '<'  # Read from the receiver
+
+# A captured frame, time is monotonic seconds while capturing and seconds since
+# the first frame once loaded from a dump
+Frame = collections.namedtuple('Frame', ['time', 'direction', 'data'])
+
+def _escape(data):
+    """Escape bytes for the dump, keeping printable ASCII as is."""
+    return data.decode('latin-1').encode('unicode_escape').decode('ascii')
+
+def _unescape(text):
+    """Reverse _escape."""
+    return codecs.decode(text, 'unicode_escape').encode('latin-1')
+
+class WireCapture(object):
+    """Ring buffer of the frames sent to and received from a receiver."""
+
+    def __init__(self, size=DEFAULT_CAPTURE_SIZE, frames=()):
+        """Initialize a capture keeping up to size frames, starting with the given ones."""
+        self.frames = collections.deque(frames, maxlen=size)
+
+    def record(self, direction, data):
+        """
+        Add a frame, TX or RX.
+
+        Received data continues the previous received frame until that ends
+        with a carriage return, so a line read in several chunks is kept as
+        one frame stamped with the time of its first byte.
+        """
+        frames = self.frames
+        if direction == RX and frames and frames[-1].direction == RX and not frames[-1].data.endswith(b'\r'):
+            frames[-1] = frames[-1]._replace(data=frames[-1].data + data)
+        else:
+            frames.append(Frame(time.monotonic(), direction, bytes(data)))
+
+    def dump(self):
+        """Return the captured frames in the dump format."""
+        frames = list(self.frames)
+        if frames:
+            # Wall clock time of the first frame, to match the capture with logs
+            started = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+                seconds=time.monotonic() - frames[0].time
+            )
+            header = f'{CAPTURE_HEADER} {started.isoformat(timespec="seconds")}'
+        else:
+            header = CAPTURE_HEADER
+        return '\n'.join([
+            header,
+            *(f'{frame.time - frames[0].time:.3f} {frame.direction} {_escape(frame.data)}' for frame in frames),
+        ]) + '\n'
+
+def load(text):
+    """Return the frames of a dump, with their time in seconds since the first frame."""
+    frames = []
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        offset, direction, data = line.split(' ', 2)
+        if direction not in (TX, RX):
+            raise ValueError(f"Unknown direction in capture line: {line}")
+        frames.append(Frame(float(offset), direction, _unescape(data)))
+    return frames
@@ -0,0 +1,101 @@
+"""
+Parser for Denon RS232 status lines.
+
+Commands and the status lines a receiver answers with or sends on its own
+share one format: a two character prefix naming the message family followed
+by the value, e.g. MV45, SICD or Z2ON. parse_line dispatches on the prefix
+with a single dict lookup and turns the line into a StatusUpdate, so command
+echoes, query replies and pushed lines all go through the same handlers.
+"""
+import collections
+
+ZONE_IDS = ['Z2', 'Z3', 'Z1']  # Zone 3 answers as Z1 on some units
+VOLUME_OFF = 99  # Volume reported for the lowest setting (---)
+
+# The fields a line updates, along with the status query that reports them.
+# zone is None for the main zone.
+StatusUpdate = collections.namedtuple('StatusUpdate', ['query', 'zone', 'fields'])
+
+def parse_volume(value):
+    """Return the volume from a volume value such as 45, 455 (45.5) or 99 (---), or None."""
+    if len(value) < 2 or not value[:2].isdigit():
+        return None
+    volume = int(value[:2])
+    return 0 if volume == VOLUME_OFF else volume
+
+def _parse_power(value):
+    """Parse a power line such as PWON or PWSTANDBY."""
+    return StatusUpdate('PW?', None, {'power': f'PW{value}'})
+
+def _parse_master_volume(value):
+    """Parse a master volume line such as MV45 or MVMAX 80."""
+    if value.startswith('MAX'):
+        volume_max = parse_volume(value[3:].strip())
+        return StatusUpdate('MV?', None, {'volume_max': volume_max}) if volume_max is not None else None
+    volume = parse_volume(value)
+    return StatusUpdate('MV?', None, {'volume': volume}) if volume is not None else None
+
+def _parse_mute(value):
+    """Parse a mute line, MUON or MUOFF."""
+    if value not in ('ON', 'OFF'):
+        return None
+    return StatusUpdate('MU?', None, {'muted': value == 'ON'})
+
+def _parse_source(value):
+    """Parse a source line such as SICD."""
+    return StatusUpdate('SI?', None, {'source': value})
+
+def _parse_sound_mode(value):
+    """Parse a sound mode line such as MSSTEREO."""
+    return StatusUpdate('MS?', None, {'sound_mode': value})
+
+def _zone_parser(zone_id):
+    """Return the parser for a zone's lines: Z2ON, Z2OFF, Z245 (volume) or Z2CD (source)."""
+    query = f'{zone_id}?'
+
+    def parse(value):
+        if value in ('UP', 'DOWN'):
+            return None
+        if value in ('ON', 'OFF'):
+            return StatusUpdate(query, zone_id, {'power': value})
+        if value[:1].isdigit():
+            volume = parse_volume(value)
+            return StatusUpdate(query, zone_id, {'volume': volume}) if volume is not None else None
+        return StatusUpdate(query, zone_id, {'source': value})
+
+    return parse
+
+PARSERS = {
+    'PW': _parse_power,
+    'MV': _parse_master_volume,
+    'MU': _parse_mute,
+    'SI': _parse_source,
+    'MS': _parse_sound_mode,
+    **{zone_id: _zone_parser(zone_id) for zone_id in ZONE_IDS},
+}
+
+def zones_from_replies(replies):
+    """
+    Return the ids of the zones that answered their status query.
+
+    Zone 3 answers to Z3, or to Z1 on units that don't know Z3. Only one of
+    the two counts, Z3 if both answer.
+    """
+    zones = [zone_id for zone_id in ZONE_IDS if replies.get(f'{zone_id}?')]
+    if 'Z3' in zones and 'Z1' in zones:
+        zones.remove('Z1')
+    return zones
+
+def parse_line(line):
+    """
+    Parse a status line or command into a StatusUpdate.
+
+    Returns None for lines of an unknown family, queries and lines without a
+    usable value. Relative volume commands such as MVUP carry no value either,
+    they need to be made absolute first.
+    """
+    parser = PARSERS.get(line[:2])
+    value = line[2:]
+    if parser is None or not value or value == '?':
+        return None
+    return parser(value)
@@ -1,122 +1,582 @@
+import asyncio
+import collections
+import functools
+import itertools
 import logging
 import serial
 import threading
 import time
 
+from .denon232_capture import DEFAULT_CAPTURE_SIZE, RX, TX, WireCapture
+from .denon232_protocol import ZONE_IDS, parse_line, zones_from_replies
+from .denon232_state import MainState, ZoneState
+from .denon232_transport import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_KEEPALIVE,
+    SERIAL_SETTINGS,
+    create_connection
+)
+
 DEFAULT_TIMEOUT = 1
 DEFAULT_WRITE_TIMEOUT = 1
-DEFAULT_REFRESH_INTERVAL = 60  # Seconds between full state refreshes
+DEFAULT_REFRESH_INTERVAL = 60  # Seconds between state refreshes, also the age at which a field goes stale
+DEFAULT_LINE_GAP = 0.1  # Seconds to wait for a further reply line once a reply has started
+DEFAULT_COMMAND_SPACING = 0.05  # Minimum seconds between commands required by the Denon spec
+DEFAULT_BYTE_DELAY = 0  # Seconds between single bytes, only needed by older units
+STATS_HISTORY = 100  # Recent samples kept per timing for percentiles
+DEFAULT_ZONE_VOLUME_MAX = 60  # Zones don't report a maximum volume
+ZONE_DISCOVERY_MAX_AGE = 24 * 60 * 60  # Seconds the zones found by discover_zones are trusted
+RECONNECT_MIN_DELAY = 1  # Seconds before the first attempt to reopen a lost connection
+RECONNECT_MAX_DELAY = 60  # Upper bound of the doubling delay between attempts
+MAX_SILENT_TIMEOUTS = 3  # Unanswered queries in a row after which the link counts as lost
+POWER_ON_SETTLE = 1.0  # Seconds a unit coming out of standby needs before it takes further commands
+DEFAULT_CONFIRM_TIMEOUT = 0.5  # Seconds a set command waits for its echo when confirmation is on
+CONFIRM_RETRIES = 2  # Times an unconfirmed set command is sent again
+ECHO_WINDOW = 1.0  # Seconds a status line for a command just written counts as its echo
+
+# Status query reporting each main zone field
+FIELD_QUERIES = {
+    'power': 'PW?',
+    'volume': 'MV?',
+    'volume_max': 'MV?',
+    'muted': 'MU?',
+    'source': 'SI?',
+    'sound_mode': 'MS?',
+}
+
+# Command priorities, lower values are sent first
+PRIORITY_COMMAND = 0  # Interactive set commands
+PRIORITY_QUERY = 1  # Targeted verification queries
+PRIORITY_REFRESH = 2  # Background state refresh
+
+# Number of lines the receiver sends in reply to each status query. MV? answers
+# with MVxx followed by MVMAX xx on units that report it, zone queries report
+# power, source and volume. Queries not listed here are read until the line gap
+# expires.
+RESPONSE_LINES = {
+    'PW?': 1,
+    'MV?': 2,
+    'MU?': 1,
+    'SI?': 1,
+    'MS?': 1,
+    'Z2?': 3,
+    'Z3?': 3,
+    'Z1?': 3,
+}
 
 _LOGGER = logging.getLogger(__name__)
 
-class Denon232Receiver(object):
-    def __init__(self, serial_port, timeout=DEFAULT_TIMEOUT, write_timeout=DEFAULT_WRITE_TIMEOUT):
-        """Initialize the Denon 232 receiver with serial connection and state storage."""
-        self.ser = serial.Serial(
-            serial_port, 
-            baudrate=9600, 
-            bytesize=serial.EIGHTBITS, 
-            parity=serial.PARITY_NONE, 
-            stopbits=serial.STOPBITS_ONE, 
-            timeout=timeout, 
-            write_timeout=write_timeout
-        )
-        self.lock = threading.Lock()
-        _LOGGER.debug("Serial connection opened.")
+@functools.lru_cache(maxsize=256)
+def encode_command(cmd):
+    """Encode a command as a single carriage return terminated frame."""
+    return f'{cmd}\r'.encode('utf-8')
+
+def probe(serial_port, queries=('PW?',), timeout=DEFAULT_TIMEOUT, line_gap=DEFAULT_LINE_GAP):
+    """
+    Open the port just long enough to send the given status queries.
+    
+    This blocks and is meant for checking a port before a receiver is set up
+    on it. Returns the reply lines per query.
+    """
+    replies = {}
+    with serial.serial_for_url(serial_port, timeout=timeout, write_timeout=timeout, **SERIAL_SETTINGS) as ser:
+        for query in queries:
+            expected = RESPONSE_LINES.get(query)
+            lines = []
+            ser.timeout = timeout
+            ser.write(encode_command(query))
+            while expected is None or len(lines) < expected:
+                line = ser.read_until(b'\r').decode(errors='replace').strip()
+                if not line:
+                    break
+                # Skip status lines unrelated to the query
+                if line.startswith(query[:-1]):
+                    lines.append(line)
+                ser.timeout = line_gap
+            replies[query] = lines
+    return replies
+
+class Denon232ConnectionError(serial.SerialException):
+    """Raised for commands while the link to the receiver is down."""
+
+class _Timing(object):
+    """Running count, total and maximum of a timed step, with a window of recent samples."""
+
+    __slots__ = ('count', 'total', 'max', 'last', 'recent')
+
+    def __init__(self):
+        """Initialize an empty timing."""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = None
+        self.recent = collections.deque(maxlen=STATS_HISTORY)
+
+    def add(self, seconds):
+        """Record one sample."""
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent.append(seconds)
+
+    def as_dict(self):
+        """Return the timing in milliseconds, the percentile covers the recent samples only."""
+        recent = sorted(self.recent)
+        return {
+            'count': self.count,
+            'last_ms': None if self.last is None else round(self.last * 1000, 2),
+            'avg_ms': round(self.total / self.count * 1000, 2) if self.count else None,
+            'p95_ms': round(recent[int(0.95 * (len(recent) - 1))] * 1000, 2) if recent else None,
+            'max_ms': round(self.max * 1000, 2),
+        }
+
+class LinkStats(object):
+    """
+    Timings and counters of the serial link.
+
+    Recording a sample is a few additions and a deque append, cheap enough
+    to stay enabled all the time. Percentiles are only computed in as_dict.
+    """
+
+    TIMINGS = ('queue_wait', 'write', 'first_byte', 'response', 'refresh')
+
+    def __init__(self):
+        """Initialize empty statistics."""
+        self.timings = {name: _Timing() for name in self.TIMINGS}
+        self.queue_waits = {
+            priority: _Timing() for priority in (PRIORITY_COMMAND, PRIORITY_QUERY, PRIORITY_REFRESH)
+        }
+        self.commands = 0
+        self.timeouts = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.confirm_misses = 0  # Set commands whose echo didn't arrive in time
+        self.unconfirmed = 0  # Set commands the receiver didn't take after all retries
+
+    def record(self, name, seconds):
+        """Record a sample for one of the TIMINGS."""
+        self.timings[name].add(seconds)
+
+    def as_dict(self):
+        """Return the statistics as plain values, e.g. for diagnostics."""
+        return {
+            'commands': self.commands,
+            'timeouts': self.timeouts,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'confirm_misses': self.confirm_misses,
+            'unconfirmed': self.unconfirmed,
+            **{name: timing.as_dict() for name, timing in self.timings.items()},
+            'queue_wait_by_priority': {
+                priority: timing.as_dict() for priority, timing in self.queue_waits.items()
+            },
+        }
+
+class Denon232Protocol(asyncio.Protocol):
+    """Split the byte stream from the receiver into carriage return terminated lines."""
+
+    def __init__(self, receiver):
+        """Initialize the protocol for the receiver it reports to."""
+        self._receiver = receiver
+        self._buffer = b''
+
+    def data_received(self, data):
+        """Hand every complete line to the receiver, keeping partial lines buffered."""
+        self._receiver._data_received(data)
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b'\r')
+        for line in lines:
+            line = line.decode(errors='replace').strip()
+            if line:
+                self._receiver._line_received(line)
+
+    def connection_lost(self, exc):
+        """Report a closed connection to the receiver."""
+        self._receiver._connection_lost(self, exc)
+
+class _QueuedCommand(object):
+    """Commands waiting in the receiver's command queue."""
+
+    __slots__ = ('cmds', 'response', 'all_lines', 'update_state', 'future', 'queued_at', 'target', 'batch',
+                 'sweep')
+
+    def __init__(self, cmds, response, all_lines, update_state, future, target=None, batch=False,
+                 sweep=False):
+        """
+        Initialize the queue item. Items with a target are volume commands that
+        may be coalesced, batch items are sent by send_batch and sweep items by
+        query_status.
+        """
+        self.cmds = cmds
+        self.target = target
+        self.batch = batch
+        self.sweep = sweep
+        self.response = response
+        self.all_lines = all_lines
+        self.update_state = update_state
+        self.future = future
+        self.queued_at = time.monotonic()
+
+class _PendingReply(object):
+    """Reply lines collected for a command, routed to it by their prefix."""
+
+    __slots__ = ('prefix', 'expected', 'lines')
+
+    def __init__(self, cmd):
+        """Initialize an empty reply to cmd."""
+        # Queries are answered with lines starting with the queried prefix,
+        # any line may belong to the reply to another command
+        self.prefix = cmd[:-1] if cmd.endswith('?') else ''
+        self.expected = RESPONSE_LINES.get(cmd)
+        self.lines = []
+
+    @property
+    def complete(self):
+        """Return whether all lines the reply is known to consist of have arrived."""
+        return self.expected is not None and len(self.lines) >= self.expected
+
+class _Confirmation(object):
+    """A set command waiting for the status line confirming it."""
+
+    __slots__ = ('cmd', 'zone', 'fields', 'written', 'future')
+
+    def __init__(self, cmd, update, future):
+        """Initialize the confirmation of cmd, parsed as update."""
+        self.cmd = cmd
+        self.zone = update.zone
+        self.fields = update.fields
+        self.written = None  # Monotonic time the command was written, lines before don't count
+        self.future = future
+
+class AsyncDenon232Receiver(object):
+    def __init__(self, serial_port, timeout=DEFAULT_TIMEOUT, line_gap=DEFAULT_LINE_GAP,
+                 command_spacing=DEFAULT_COMMAND_SPACING, byte_delay=DEFAULT_BYTE_DELAY, zones=None,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, keepalive=DEFAULT_KEEPALIVE, capture_size=0,
+                 confirm_timeout=0):
+        """
+        Initialize the Denon 232 receiver state storage. The connection is opened by connect().
+        
+        The serial port may also be a network serial bridge, see
+        denon232_transport. Only the given zone ids are queried during
+        refreshes. Without zones all possible zones are probed by
+        initialize_state. With a capture size the latest frames on the wire
+        are kept in capture, see start_capture. With a confirm timeout set
+        commands wait for the receiver's echo, see serial_command.
+        """
+        self._serial_port = serial_port
+        self._connect_timeout = connect_timeout
+        self._keepalive = keepalive
+        self._zone_ids = list(zones) if zones is not None else None
+        self.available_zones = None  # Zones found by the last discover_zones()
+        self.zones_discovered = None  # Monotonic time of the last discover_zones()
+        self._transport = None
+        self._protocol = None
+        self.available = False  # Whether the link is up, commands fail right away otherwise
+        self._supervisor = None  # Task reopening a lost connection
+        self._reconnect_delay = RECONNECT_MIN_DELAY
+        self._silent_timeouts = 0
+        self._queue = asyncio.PriorityQueue()
+        self._queue_seq = itertools.count()
+        self._worker = None
+        self._pending_volume = {}  # Volume commands not yet sent, per target
+        self._timeout = timeout
+        self._line_gap = line_gap
+        self._command_spacing = command_spacing
+        self._byte_delay = byte_delay
+        self._last_write = 0
+        
+        # Replies being collected per command, filled in by the protocol as lines arrive
+        self._replies = {}
+        self._reply_waiter = None
+        
+        # Set commands waiting for their echo, see _send_confirmed
+        self.confirm_timeout = confirm_timeout
+        self._confirmations = {}  # _Confirmation objects per status query and zone
+        self._latest_commands = {}  # Latest confirmed command per status query, zone and fields
+        self._written = {}  # Monotonic time a set command was last written, per two character prefix
+        
+        # Callbacks for status lines the receiver sends on its own
+        self._listeners = []
+        self._batch_changes = None  # Changes held back until the batch being sent is done
+        
+        # Link timings and counters. The first byte of a reply is timed from
+        # the latest write after the reply was requested.
+        self.stats = LinkStats()
+        self._reply_requested = None
+        
+        # Raw frames sent and received, only kept while capturing
+        self.capture = WireCapture(capture_size) if capture_size else None
+        
+        # When each status query's fields were last confirmed by the receiver
+        self._confirmed = {}
+        
+        # Monotonic times of the latest activity, for scheduling refreshes
+        self.last_command = None  # Command sent through serial_command or send_commands
+        self.last_push = None  # Status line the receiver sent on its own, changing the state
+        self.last_external_change = None  # State change not caused by a command
         
         # Initialize state cache
-        self.state = {
-            'power': 'PWSTANDBY',  # Default to standby
-            'volume': 0,
-            'volume_max': 80,  # Default, will be updated during initialization
-            'muted': False,
-            'source': '',
-            'sound_mode': '',
-            'zones': {}  # Storage for zone states
-        }
+        self.state = MainState(self._zone_ids or [])
+
+    async def connect(self):
+        """
+        Open the serial connection and initialize it.
+        
+        From here on the connection is supervised: once it is lost, or the
+        receiver stops answering queries it used to answer, it is reopened with
+        a doubling delay and the state is resynced. Commands fail with
+        Denon232ConnectionError until then.
+        """
+        await self._open()
+        self.available = True
+        self._worker = asyncio.get_running_loop().create_task(self._process_queue())
         
         # Initialize the connection
-        self.initialize_connection()
+        await self.initialize_connection()
+
+    async def _open(self):
+        """Open the serial connection."""
+        self._transport, self._protocol = await create_connection(
+            lambda: Denon232Protocol(self),
+            self._serial_port,
+            connect_timeout=self._connect_timeout,
+            keepalive=self._keepalive
+        )
+        _LOGGER.debug("Serial connection opened.")
+
+    def close(self):
+        """Close the serial connection."""
+        self.available = False
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            self._supervisor = None
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
         
-        # Get initial state
-        self.initialize_state()
+        self._fail_queued(serial.SerialException("Receiver connection closed"))
+        self._close_transport()
 
-    def initialize_connection(self):
+    def _close_transport(self):
+        """Close the serial transport, if open."""
+        if self._transport is not None:
+            self._protocol = None
+            self._transport.close()
+            self._transport = None
+            _LOGGER.debug("Serial connection closed.")
+
+    def _fail_queued(self, exc):
+        """Fail every command still waiting to be sent with exc."""
+        self._pending_volume.clear()
+        while not self._queue.empty():
+            _, _, item = self._queue.get_nowait()
+            if not item.future.done():
+                item.future.set_exception(exc)
+
+    def _link_down(self, reason):
+        """
+        Mark the link as down and start reopening it.
+        
+        Queued commands and a reply being waited for fail right away, as does
+        every command issued until the link is back.
+        """
+        if not self.available or self._worker is None:
+            return
+        _LOGGER.warning("Receiver link on %s lost: %s", self._serial_port, reason)
+        self.available = False
+        
+        exc = Denon232ConnectionError(f"Receiver link is down: {reason}")
+        self._fail_queued(exc)
+        if self._reply_waiter is not None and not self._reply_waiter.done():
+            self._reply_waiter.set_exception(exc)
+        self._close_transport()
+        
+        self._supervisor = asyncio.get_running_loop().create_task(self._reconnect())
+        self._notify_listeners({})
+
+    async def _reconnect(self):
+        """Reopen the connection with a doubling delay, then resync the state."""
+        while True:
+            delay = self._reconnect_delay
+            self._reconnect_delay = min(delay * 2, RECONNECT_MAX_DELAY)
+            await asyncio.sleep(delay)
+            try:
+                await self._open()
+            except OSError as exc:
+                _LOGGER.debug("Reopening %s failed, next attempt in %ss: %s",
+                              self._serial_port, self._reconnect_delay, exc)
+                continue
+            break
+        
+        _LOGGER.info("Receiver link on %s is back", self._serial_port)
+        self._supervisor = None
+        self._silent_timeouts = 0
+        self.available = True
+        self._notify_listeners({})
+        
+        # Anything may have changed in the meantime. The refresh only covers
+        # what is of interest in the current power state.
+        self._confirmed.clear()
+        try:
+            await self.refresh()
+        except serial.SerialException as exc:
+            _LOGGER.debug("Resync after reconnect failed: %s", exc)
+
+    async def initialize_connection(self):
         """Initialize the connection to the receiver."""
-        self.serial_command('PWSTANDBY', response=False)
+        # A unit in standby doesn't echo this, waiting for it would only stall the connect
+        await self.serial_command('PWSTANDBY', response=False, confirm=False)
         # We don't sleep here anymore as we're not immediately requesting state
 
-    def initialize_state(self):
-        """Get the initial state from the receiver."""
+    async def initialize_state(self):
+        """
+        Get the initial state from the receiver.
+        
+        All status queries go out in one sweep, see query_status. Zones that
+        answer are added to the state, listeners are called once with every
+        change.
+        """
         _LOGGER.debug("Initializing receiver state")
+        started = time.monotonic()
         
-        # Get power state
-        self.state['power'] = self.serial_command('PW?', response=True, update_state=False)
+        zone_ids = self._zone_ids if self._zone_ids is not None else ZONE_IDS
+        replies = await self.query_status(
+            ['PW?', 'MV?', 'MU?', 'SI?', 'MS?', *(f'{zone_id}?' for zone_id in zone_ids)],
+            update_state=False
+        )
         
-        # Get volume info including max volume
-        volume_lines = self.serial_command('MV?', response=True, all_lines=True, update_state=False)
-        for line in volume_lines:
-            if line.startswith('MVMAX '):
-                try:
-                    # Only grab two digit max, don't care about any half digit
-                    self.state['volume_max'] = int(line[len('MVMAX '):len('MVMAX XX')])
-                    _LOGGER.debug("MVMAX Value Saved: %s", self.state['volume_max'])
-                except (ValueError, IndexError):
-                    _LOGGER.error("Failed to parse MVMAX value: %s", line)
-            elif line.startswith('MV'):
-                try:
-                    volume = int(line[len('MV'):len('MVXX')])
-                    if volume == 99:
-                        volume = 0
-                    self.state['volume'] = volume
-                    _LOGGER.debug("MV Value Saved: %s", self.state['volume'])
-                except (ValueError, IndexError):
-                    _LOGGER.error("Failed to parse MV value: %s", line)
-        
-        # Get mute state
-        mute_response = self.serial_command('MU?', response=True, update_state=False)
-        self.state['muted'] = (mute_response == 'MUON')
-        
-        # Get current source
-        source_response = self.serial_command('SI?', response=True, update_state=False)
-        if source_response and source_response.startswith('SI'):
-            self.state['source'] = source_response[len('SI'):]
-        
-        # Get sound mode
-        mode_response = self.serial_command('MS?', response=True, update_state=False)
-        if mode_response and mode_response.startswith('MS'):
-            self.state['sound_mode'] = mode_response[len('MS'):]
-        
-        # Check available zones and their states
-        for zone_id in ['Z2', 'Z3', 'Z1']:  # Try all possible zones
-            zone_lines = self.serial_command(f'{zone_id}?', response=True, all_lines=True, update_state=False)
-            if zone_lines:
-                _LOGGER.debug(f"Found zone {zone_id}")
-                self.state['zones'][zone_id] = {
-                    'power': 'ON' if any(line.endswith('ON') for line in zone_lines) else 'OFF',
-                    'volume': 0,
-                    'source': ''
-                }
-                
-                # Parse zone volume and source
-                for line in zone_lines:
-                    if line.startswith(zone_id):
-                        if line[len(zone_id):].isdigit():
-                            try:
-                                volume = int(line[len(zone_id):len(zone_id) + 2])
-                                if volume == 99:
-                                    volume = 0
-                                self.state['zones'][zone_id]['volume'] = volume
-                                _LOGGER.debug(f"{zone_id} Volume value Saved: {volume}")
-                            except (ValueError, IndexError):
-                                _LOGGER.error(f"Failed to parse {zone_id} volume: {line}")
-                        elif not line.endswith('ON') and not line.endswith('OFF'):
-                            self.state['zones'][zone_id]['source'] = line[len(zone_id):]
+        added = [
+            zone_id for zone_id in zone_ids
+            if replies[f'{zone_id}?'] and zone_id not in self.state.zones
+        ]
+        for zone_id in added:
+            _LOGGER.debug(f"Found zone {zone_id}")
+            self.state.zones[zone_id] = ZoneState()
+        changes = self._update_state_from_replies(replies)
+        for zone_id in added:
+            changes[zone_id] = set(ZoneState.__slots__)
+        if changes:
+            self.last_external_change = time.monotonic()
+            self._notify_listeners(changes)
         
+        self.stats.record('refresh', time.monotonic() - started)
         _LOGGER.debug("Receiver state initialized: %s", self.state)
         return self.state
 
-    def serial_command(self, cmd, response=False, all_lines=False, update_state=True):
+    def snapshot(self):
+        """
+        Return the cached state for storing across restarts.
+        
+        Besides the state this holds the zones found by discover_zones, and the
+        wall clock time of that discovery and of each status query's fields
+        last being confirmed.
+        """
+        offset = time.time() - time.monotonic()
+        return {
+            'state': self.state.as_dict(),
+            'available_zones': self.available_zones,
+            'zones_discovered': self.zones_discovered + offset if self.zones_discovered is not None else None,
+            'confirmed': {query: confirmed + offset for query, confirmed in self._confirmed.items()},
+        }
+
+    def restore(self, snapshot):
+        """
+        Seed the state cache from a snapshot, for example after a restart.
+        
+        Only fields the receiver hasn't confirmed yet are taken over. They keep
+        the age they had in the snapshot, so refresh queries them once they
+        are stale.
+        """
+        restorable = {
+            query for query in [*FIELD_QUERIES.values(), *(f'{zone_id}?' for zone_id in self.state.zones)]
+            if query not in self._confirmed
+        }
+        
+        for field, value in snapshot.get('state', {}).items():
+            if field == 'zones':
+                for zone_id, zone_state in value.items():
+                    if f'{zone_id}?' in restorable:
+                        self.state.zones[zone_id].apply(zone_state)
+            elif FIELD_QUERIES.get(field) in restorable:
+                self.state.apply({field: value})
+        
+        offset = time.time() - time.monotonic()
+        for query, confirmed in snapshot.get('confirmed', {}).items():
+            if query in restorable:
+                self._confirmed[query] = confirmed - offset
+        
+        if self.available_zones is None and snapshot.get('available_zones') is not None:
+            self.available_zones = snapshot['available_zones']
+            discovered = snapshot.get('zones_discovered')
+            self.zones_discovered = discovered - offset if discovered is not None else None
+
+    def add_zones(self, zone_ids):
+        """
+        Start tracking further zones, for example those of another config entry on the port.
+        
+        They start out with default states and are queried by the next refresh.
+        """
+        for zone_id in zone_ids:
+            if zone_id not in self.state.zones:
+                _LOGGER.debug("Adding zone %s", zone_id)
+                self.state.zones[zone_id] = ZoneState()
+            if self._zone_ids is not None and zone_id not in self._zone_ids:
+                self._zone_ids.append(zone_id)
+
+    async def discover_zones(self):
+        """Probe which zones the receiver supports, without touching the zone states."""
+        _LOGGER.debug("Determining available zones")
+        replies = await self.query_status([f'{zone_id}?' for zone_id in ZONE_IDS], update_state=False)
+        zones = zones_from_replies(replies)
+        _LOGGER.debug("Found zones: %s", zones)
+        
+        self.available_zones = zones
+        self.zones_discovered = time.monotonic()
+        return zones
+
+    def known_zones(self, max_age):
+        """Return the zones found by a discovery within the last max_age seconds, or None."""
+        if self.zones_discovered is None or time.monotonic() - self.zones_discovered > max_age:
+            return None
+        return self.available_zones
+
+    def stale_queries(self, max_age=DEFAULT_REFRESH_INTERVAL):
+        """
+        Return the status queries whose fields haven't been confirmed within max_age seconds.
+        
+        Fields count as confirmed by query replies as well as by status lines
+        the receiver sends on its own, for example as echo of a command. While
+        the main unit is in standby only the power state is of interest.
+        """
+        if self.state.power == 'PWON':
+            queries = ['PW?', 'MV?', 'MU?', 'SI?', 'MS?'] + [f'{zone_id}?' for zone_id in self.state.zones]
+        else:
+            queries = ['PW?']
+        
+        oldest = time.monotonic() - max_age
+        return [query for query in queries if self._confirmed.get(query, 0) < oldest]
+
+    async def refresh(self, max_age=DEFAULT_REFRESH_INTERVAL):
+        """Query only the fields that went stale, see stale_queries."""
+        started = time.monotonic()
+        while True:
+            was_on = self.state.power == 'PWON'
+            queries = self.stale_queries(max_age)
+            _LOGGER.debug("Refreshing receiver state: %s", queries)
+            if queries:
+                await self.query_status(queries)
+            
+            # If the unit turned out to be on, the remaining fields are of interest as well
+            if was_on or self.state.power != 'PWON':
+                break
+        
+        self.stats.record('refresh', time.monotonic() - started)
+        return self.state
+
+    async def serial_command(self, cmd, response=False, all_lines=False, update_state=True,
+                             priority=None, confirm=None):
         """
         Send command to receiver and optionally update internal state.
         
@@ -125,163 +585,700 @@ class Denon232Receiver(object):
             response (bool): Whether to wait for a response
             all_lines (bool): Whether to return all response lines or just first one
             update_state (bool): Whether to update internal state based on command
+            priority (int): Queue priority, defaults to PRIORITY_QUERY for queries
+                and PRIORITY_COMMAND for everything else
+            confirm (bool): Whether a set command waits for the receiver's echo,
+                see _send_confirmed. Defaults to whether a confirm timeout is set.
+        """
+        if priority is None:
+            priority = PRIORITY_QUERY if cmd.endswith('?') else PRIORITY_COMMAND
+        if not cmd.endswith('?'):
+            self.last_command = time.monotonic()
+        
+        volume_command = self._absolute_volume_command(cmd) if not response and update_state else None
+        if volume_command is not None:
+            target, cmd = volume_command
+            send = functools.partial(self._send_volume, priority, target, cmd)
+        else:
+            send = functools.partial(self._enqueue, priority, [cmd], response, all_lines, update_state)
+        
+        if confirm is None:
+            confirm = bool(self.confirm_timeout)
+        if confirm and not response and update_state and (update := parse_line(cmd)) is not None:
+            return await self._send_confirmed(cmd, update, send)
+        return await send()
+
+    async def _send_volume(self, priority, target, cmd):
+        """
+        Send an absolute volume command.
+        
+        Volume changes are coalesced, only the latest value per target is sent.
+        The cached state follows every change right away.
+        """
+        self._update_state_from_command(cmd)
+        return await self._enqueue(priority, [cmd], False, False, False, target=target)
+
+    async def _send_confirmed(self, cmd, update, send):
+        """
+        Send a set command and wait for the status line confirming it.
+        
+        Only status lines received after the command was written count, and
+        they have to report the commanded values, volumes may be clamped to
+        the maximum. If none arrives within the confirm timeout only the status
+        query for those fields is sent. Unless the reply shows the command took
+        effect it is sent again, up to CONFIRM_RETRIES times. A newer command
+        for the same fields takes over without any query. Either way the state
+        ends up as the receiver reports it, returns whether it was confirmed.
+        
+        Args:
+            cmd (str): Set command to send
+            update (StatusUpdate): The command parsed as status line
+            send (callable): Returns an awaitable sending the command
+        """
+        waiter_key = (update.query, update.zone)
+        key = (*waiter_key, frozenset(update.fields))
+        token = self._latest_commands[key] = object()
+        loop = asyncio.get_running_loop()
+        try:
+            for attempt in range(CONFIRM_RETRIES + 1):
+                confirmation = _Confirmation(cmd, update, loop.create_future())
+                waiters = self._confirmations.setdefault(waiter_key, [])
+                waiters.append(confirmation)
+                try:
+                    await send()
+                    await asyncio.wait_for(confirmation.future, self.confirm_timeout)
+                    return True
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    waiters.remove(confirmation)
+                    if not waiters:
+                        del self._confirmations[waiter_key]
+                
+                if self._latest_commands.get(key) is not token:
+                    # A newer command for the fields replaced this one, it verifies them
+                    return True
+                
+                # The echo got lost or the receiver dropped the command, ask for the fields
+                self.stats.confirm_misses += 1
+                await self.serial_command(update.query, response=True, all_lines=True)
+                if self._latest_commands.get(key) is not token:
+                    return True
+                state = self.state if update.zone is None else self.state.zones.get(update.zone)
+                if state is None or self._reports(update.zone, update.fields, state.as_dict()):
+                    return True
+                _LOGGER.debug("Receiver didn't take %s, attempt %d", cmd, attempt + 1)
+            
+            self.stats.unconfirmed += 1
+            _LOGGER.warning("Receiver didn't take %s after %d attempts", cmd, CONFIRM_RETRIES + 1)
+            return False
+        finally:
+            if self._latest_commands.get(key) is token:
+                del self._latest_commands[key]
+
+    async def query_status(self, queries, update_state=True, priority=PRIORITY_REFRESH):
+        """
+        Send several status queries back to back and return the reply lines per query.
+        
+        The queries are written without waiting for the replies in between,
+        each incoming line is routed to the query whose prefix it starts with.
+        A sweep over all fields thus costs about one round trip instead of one
+        per query. The sweep is a single queue item, so commands issued in the
+        meantime wait for all of it rather than one query, about 0.3s for the
+        main zone and one further zone at 9600 baud. Splitting it up would
+        let their echoes land among the replies being collected.
+        
+        Args:
+            queries (list): Status queries such as PW? or Z2?, answered by distinct prefixes
+            update_state (bool): Whether to update internal state from the replies
+            priority (int): Queue priority
         """
-        _LOGGER.debug('Sending command: %s', cmd)
+        return await self._enqueue(priority, list(dict.fromkeys(queries)), True, True, update_state, sweep=True)
+
+    async def send_commands(self, cmds, update_state=True, priority=PRIORITY_COMMAND):
+        """
+        Send several commands to the receiver in one go without waiting for responses.
+        
+        Args:
+            cmds (list): Commands to send, in order
+            update_state (bool): Whether to update internal state based on the commands
+            priority (int): Queue priority
+        """
+        self.last_command = time.monotonic()
+        await self._enqueue(priority, list(cmds), False, False, update_state)
+
+    async def send_batch(self, cmds, priority=PRIORITY_COMMAND):
+        """
+        Send an ordered list of commands as one burst and return the timing of each step.
+        
+        Nothing else is sent in between. Commands following a PWON that woke
+        the unit from standby are held back until it has settled. Listeners
+        are called once at the end with all state changes of the batch.
         
-        with self.lock:  # Use context manager to ensure the lock is always released
-            # Send each character with a carriage return
-            for char in f'{cmd}\r':
-                self.ser.write(char.encode('utf-8'))
-                self.ser.flush()
+        Args:
+            cmds (list): Commands to send, in order
+            priority (int): Queue priority
+        
+        Returns a list with a dict per command holding the command, the
+        milliseconds from the start of the batch until it was written and the
+        milliseconds it took to write including any spacing or settle delay.
+        """
+        self.last_command = time.monotonic()
+        return await self._enqueue(priority, list(cmds), False, False, True, batch=True)
+
+    def start_capture(self, size=DEFAULT_CAPTURE_SIZE):
+        """
+        Start keeping the latest size frames sent and received in capture.
+        
+        The capture can be dumped for offline analysis with tools/replay.py.
+        The frames of an ongoing capture are kept.
+        """
+        self.capture = WireCapture(size, self.capture.frames if self.capture is not None else ())
+
+    def stop_capture(self):
+        """Stop capturing and return the capture, or None if there was none."""
+        capture, self.capture = self.capture, None
+        return capture
+
+    def add_listener(self, callback):
+        """
+        Register a callback for state updates from the receiver.
+
+        The callback is called from the event loop whenever commands, status
+        lines the receiver sends on its own or replies to state queries
+        changed the state. It gets the names of the changed fields per zone id, None
+        standing for the main zone. When the link goes down or comes back it is
+        called with an empty dict. Returns a function that removes the
+        callback again.
+        """
+        self._listeners.append(callback)
+        return lambda: self._listeners.remove(callback)
+
+    def _absolute_volume_command(self, cmd):
+        """
+        Return the target and absolute volume command for a volume command.
+        
+        Relative steps such as MVUP or Z2DOWN are folded into an absolute volume
+        based on the cached state. Returns None for any other command.
+        """
+        if cmd.startswith('MV'):
+            target = 'MV'
+            volume = self.state.volume
+            volume_max = self.state.volume_max
+        elif cmd[:2] in self.state.zones:
+            target = cmd[:2]
+            volume = self.state.zones[target].volume
+            volume_max = DEFAULT_ZONE_VOLUME_MAX
+        else:
+            return None
+        
+        value = cmd[len(target):]
+        if value.isdigit():
+            return target, cmd
+        elif value == 'UP':
+            volume = min(volume + 1, volume_max)
+        elif value == 'DOWN':
+            volume = max(volume - 1, 0)
+        else:
+            return None
+        return target, f'{target}{str(volume).zfill(2)}'
+
+    async def _enqueue(self, priority, cmds, response, all_lines, update_state, target=None, batch=False,
+                       sweep=False):
+        """
+        Queue commands for the worker and wait for their result.
+        
+        A command with a target replaces the command for the same target that
+        is still waiting in the queue, and its caller shares that item's result.
+        """
+        if self._worker is None:
+            raise serial.SerialException("Receiver is not connected")
+        if not self.available:
+            raise Denon232ConnectionError("Receiver link is down")
+        
+        if target is not None and target in self._pending_volume:
+            item = self._pending_volume[target]
+            item.cmds = cmds
+            return await asyncio.shield(item.future)
+        
+        item = _QueuedCommand(
+            cmds, response, all_lines, update_state, asyncio.get_running_loop().create_future(),
+            target=target, batch=batch, sweep=sweep
+        )
+        self._queue.put_nowait((priority, next(self._queue_seq), item))
+        
+        if target is not None:
+            # Several callers may share the item, one giving up must not cancel it
+            self._pending_volume[target] = item
+            return await asyncio.shield(item.future)
+        return await item.future
+
+    async def _process_queue(self):
+        """Send queued commands one item at a time, highest priority first."""
+        while True:
+            priority, _, item = await self._queue.get()
+            if item.target is not None:
+                # From here on a new volume command needs a new queue item
+                self._pending_volume.pop(item.target, None)
+            if item.future.done():
+                # The caller gave up waiting
+                continue
+            
+            wait = time.monotonic() - item.queued_at
+            self.stats.record('queue_wait', wait)
+            self.stats.queue_waits[priority].add(wait)
+            self.stats.commands += 1
+            _LOGGER.debug('Sending %s after %.3fs in queue', item.cmds, wait)
             
-            # Update internal state based on command if requested
-            if update_state and not cmd.endswith('?'):
+            try:
+                result = await self._execute(item)
+            except asyncio.CancelledError:
+                if not item.future.done():
+                    item.future.cancel()
+                raise
+            except Exception as exc:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+            else:
+                if not item.future.done():
+                    item.future.set_result(result)
+
+    async def _execute(self, item):
+        """Write a queued item to the receiver and collect its response."""
+        if item.batch:
+            return await self._execute_batch(item)
+        
+        # Update internal state based on command if requested. This happens
+        # before writing, echoes of earlier frames may arrive while the later
+        # ones are held back and relative steps must not apply on top of them.
+        if item.update_state:
+            for sent in item.cmds:
+                if not sent.endswith('?'):
+                    self._update_state_from_command(sent)
+        
+        if not item.response:
+            await self._write_frames([encode_command(sent) for sent in item.cmds])
+            self._note_written(item.cmds)
+            if self._confirmations:
+                self._arm_confirmations(item.cmds)
+            return None
+        
+        # Claim reply lines before writing, replies may arrive right away
+        self._expect_replies(item.cmds)
+        self._reply_requested = time.monotonic()
+        try:
+            await self._write_frames([encode_command(sent) for sent in item.cmds])
+            written = time.monotonic()
+            replies = await self._read_responses()
+        finally:
+            self._reply_requested = None
+        self.stats.record('response', time.monotonic() - written)
+        
+        # Update our state with the replies to queries if update_state is True
+        if item.update_state:
+            changes = self._update_state_from_replies(replies)
+            if changes:
+                self.last_external_change = time.monotonic()
+                self._notify_listeners(changes)
+        
+        # Sweeps always return the lines per query, single commands their reply
+        if item.sweep:
+            return replies
+        lines = replies[item.cmds[0]]
+        return lines if item.all_lines else lines[0] if lines else None
+
+    async def _execute_batch(self, item):
+        """Write the commands of a batch one by one, collecting the state changes and step timings."""
+        started = time.monotonic()
+        steps = []
+        self._batch_changes = {}
+        try:
+            for index, cmd in enumerate(item.cmds):
+                waking = cmd == 'PWON' and self.state.power != 'PWON'
                 self._update_state_from_command(cmd)
                 
-            if response:
-                lines = self._read_response()
+                step_started = time.monotonic()
+                await self._write_frames([encode_command(cmd)])
+                self._note_written([cmd])
+                written = time.monotonic()
+                if waking and index < len(item.cmds) - 1:
+                    await asyncio.sleep(POWER_ON_SETTLE)
                 
-                # If this was a query command and update_state is True,
-                # update our state with the response
-                if cmd.endswith('?') and update_state and lines:
-                    self._update_state_from_response(cmd, lines)
-                    
-                return lines if all_lines else lines[0] if lines else None
-
-    def _read_response(self):
-        """Read response from the receiver."""
-        lines = []
-        while True:
-            line = self.ser.readline().decode().strip()
-            if not line:
-                break
-            lines.append(line)
-            _LOGGER.debug("Received line: %s", line)
-        return lines
+                steps.append({
+                    'command': cmd,
+                    'sent_ms': round((written - started) * 1000, 2),
+                    'duration_ms': round((time.monotonic() - step_started) * 1000, 2),
+                })
+        finally:
+            changes, self._batch_changes = self._batch_changes, None
+            if changes:
+                self._notify_listeners(changes)
+        return steps
+
+    async def _write_frames(self, frames):
+        """
+        Write encoded command frames to the receiver. Must only be called by the queue worker.
+
+        Without command spacing all frames go out as a single write. Otherwise
+        each frame is written whole and the next one is held back until the
+        spacing since the previous command has passed. A byte delay paces every
+        byte individually for units that can't keep up with a full frame.
+        """
+        if self._transport is None:
+            raise Denon232ConnectionError("Receiver link is down")
+        
+        self.stats.bytes_out += sum(len(frame) for frame in frames)
+        if not self._command_spacing and not self._byte_delay:
+            started = time.monotonic()
+            if self.capture is not None:
+                for frame in frames:
+                    self.capture.record(TX, frame)
+            self._transport.write(b''.join(frames))
+            self._last_write = time.monotonic()
+            self.stats.record('write', self._last_write - started)
+            return
+        
+        # The write timing leaves out the command spacing, it covers the writes and byte pacing
+        writing = 0
+        for frame in frames:
+            wait = self._last_write + self._command_spacing - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            started = time.monotonic()
+            if self.capture is not None:
+                self.capture.record(TX, frame)
+            if self._byte_delay:
+                for byte in frame:
+                    self._transport.write(bytes((byte,)))
+                    await asyncio.sleep(self._byte_delay)
+            else:
+                self._transport.write(frame)
+            self._last_write = time.monotonic()
+            writing += self._last_write - started
+        self.stats.record('write', writing)
+
+    def _data_received(self, data):
+        """Count and capture received bytes, and time the first byte of a pending reply."""
+        self.stats.bytes_in += len(data)
+        if self.capture is not None:
+            self.capture.record(RX, data)
+        if self._reply_requested is not None and self._last_write >= self._reply_requested:
+            self.stats.record('first_byte', time.monotonic() - self._last_write)
+            self._reply_requested = None
+
+    def _line_received(self, line):
+        """Route a received line to the reply it belongs to or update state from it."""
+        _LOGGER.debug("Received line: %s", line)
+        self._silent_timeouts = 0
+        self._reconnect_delay = RECONNECT_MIN_DELAY
+        
+        for reply in self._replies.values():
+            if not reply.complete and line.startswith(reply.prefix):
+                reply.lines.append(line)
+                if self._reply_waiter is not None and not self._reply_waiter.done():
+                    self._reply_waiter.set_result(None)
+                return
+        
+        changes = self._update_state_from_line(line)
+        if changes:
+            self._notify_listeners(changes)
+
+    def _notify_listeners(self, changes):
+        """Pass the changed fields per zone to the listeners, or hold them back while a batch is sent."""
+        if changes and self._batch_changes is not None:
+            for zone, fields in changes.items():
+                self._batch_changes.setdefault(zone, set()).update(fields)
+            return
+        
+        for listener in list(self._listeners):
+            try:
+                listener(changes)
+            except Exception:
+                _LOGGER.exception("Error in receiver update listener")
+
+    def _connection_lost(self, protocol, exc):
+        """Handle the serial connection going away, unless it was closed on purpose."""
+        if protocol is not self._protocol:
+            return
+        self._protocol = None
+        self._transport = None
+        self._link_down(exc or "connection closed")
+
+    def _expect_replies(self, cmds):
+        """Route incoming lines belonging to the replies to cmds to the waiting command."""
+        self._replies = {cmd: _PendingReply(cmd) for cmd in cmds}
+
+    async def _read_responses(self):
+        """
+        Wait for the replies to the commands just sent and return their lines per command.
+
+        Waiting stops as soon as every reply has the number of lines expected
+        for its query. Until each reply has started the full timeout applies
+        between lines, after that any further line has to follow within the
+        inter-line gap.
+        """
+        replies = self._replies
+        loop = asyncio.get_running_loop()
+        try:
+            while not all(reply.complete for reply in replies.values()):
+                started = all(reply.lines for reply in replies.values())
+                self._reply_waiter = loop.create_future()
+                try:
+                    await asyncio.wait_for(self._reply_waiter, self._line_gap if started else self._timeout)
+                except asyncio.TimeoutError:
+                    break
+        finally:
+            self._replies = {}
+            self._reply_waiter = None
+        
+        for reply in replies.values():
+            if not reply.lines or reply.expected is not None and not reply.complete:
+                self.stats.timeouts += 1
+        if not any(reply.lines for reply in replies.values()) and any(cmd in self._confirmed for cmd in replies):
+            # Queries the receiver answered before went unanswered
+            self._silent_timeouts += 1
+        
+        if self._silent_timeouts >= MAX_SILENT_TIMEOUTS:
+            self._link_down(f"{self._silent_timeouts} queries in a row went unanswered")
+        return {cmd: reply.lines for cmd, reply in replies.items()}
     
     def _update_state_from_command(self, cmd):
         """Update internal state based on command sent."""
-        # Power commands
-        if cmd == 'PWON':
-            self.state['power'] = 'PWON'
-        elif cmd == 'PWSTANDBY':
-            self.state['power'] = 'PWSTANDBY'
-        
-        # Volume commands
-        elif cmd == 'MVUP':
-            # Volume up, increment by 1
-            self.state['volume'] = min(self.state['volume'] + 1, self.state['volume_max'])
-        elif cmd == 'MVDOWN':
-            # Volume down, decrement by 1
-            self.state['volume'] = max(self.state['volume'] - 1, 0)
-        elif cmd.startswith('MV') and len(cmd) > 2:
-            # Direct volume setting (MV70)
-            try:
-                volume = int(cmd[2:4])
-                self.state['volume'] = volume
-            except (ValueError, IndexError):
-                _LOGGER.debug("Could not parse volume from command: %s", cmd)
-        
-        # Mute commands
-        elif cmd == 'MUON':
-            self.state['muted'] = True
-        elif cmd == 'MUOFF':
-            self.state['muted'] = False
-        
-        # Source selection
-        elif cmd.startswith('SI') and len(cmd) > 2:
-            self.state['source'] = cmd[2:]
-        
-        # Sound mode
-        elif cmd.startswith('MS') and len(cmd) > 2:
-            self.state['sound_mode'] = cmd[2:]
-        
-        # Zone commands
-        for zone_id in self.state['zones']:
-            if cmd.startswith(zone_id):
-                if cmd == f'{zone_id}ON':
-                    self.state['zones'][zone_id]['power'] = 'ON'
-                elif cmd == f'{zone_id}OFF':
-                    self.state['zones'][zone_id]['power'] = 'OFF'
-                elif cmd == f'{zone_id}UP':
-                    # Zone volume up
-                    self.state['zones'][zone_id]['volume'] = min(
-                        self.state['zones'][zone_id]['volume'] + 1, 
-                        self.state['zones'].get('volume_max', 60)
-                    )
-                elif cmd == f'{zone_id}DOWN':
-                    # Zone volume down
-                    self.state['zones'][zone_id]['volume'] = max(
-                        self.state['zones'][zone_id]['volume'] - 1, 0
-                    )
-                elif len(cmd) > len(zone_id) and cmd[len(zone_id):].isdigit():
-                    # Direct zone volume setting
-                    try:
-                        volume = int(cmd[len(zone_id):len(zone_id) + 2])
-                        self.state['zones'][zone_id]['volume'] = volume
-                    except (ValueError, IndexError):
-                        _LOGGER.debug("Could not parse zone volume from command: %s", cmd)
-                elif len(cmd) > len(zone_id):
-                    # Zone source selection
-                    self.state['zones'][zone_id]['source'] = cmd[len(zone_id):]
+        volume_command = self._absolute_volume_command(cmd)
+        if volume_command is not None:
+            _, cmd = volume_command
+        
+        update = parse_line(cmd)
+        if update is not None and (changed := self._apply_update(update)):
+            self._notify_listeners({update.zone: changed})
+    
+    def _update_state_from_line(self, line):
+        """
+        Update internal state from a status line the receiver sent on its own.
+        
+        Only a line that changes the state and isn't the echo of a command
+        counts as pushed, which proves the receiver reports changes nobody
+        asked it for. Echoes confirm a command waiting for them or follow a
+        command with the same prefix within ECHO_WINDOW.
+        
+        Returns the changed fields per zone, or None if the line wasn't recognised.
+        """
+        update = parse_line(line)
+        if update is None:
+            return None
+        changed = self._apply_update(update)
+        if changed is None:
+            return None
+        now = self._confirmed[update.query] = time.monotonic()
+        echo = self._confirm_command(update)
+        if changed and not echo:
+            written = self._written.get(line[:2])
+            if written is None or now - written >= ECHO_WINDOW:
+                self.last_push = self.last_external_change = now
+        return {update.zone: changed} if changed else {}
     
     def _update_state_from_response(self, cmd, lines):
-        """Update internal state based on response to a query command."""
+        """Update internal state based on response to a query command. Returns the changed fields per zone."""
+        changes = {}
         if not lines:
-            return
+            return changes
         
-        # Power state query
-        if cmd == 'PW?':
-            self.state['power'] = lines[0]
-            
-        # Volume query
-        elif cmd == 'MV?':
-            for line in lines:
-                if line.startswith('MVMAX '):
-                    try:
-                        self.state['volume_max'] = int(line[len('MVMAX '):len('MVMAX XX')])
-                    except (ValueError, IndexError):
-                        pass
-                elif line.startswith('MV'):
-                    try:
-                        volume = int(line[len('MV'):len('MVXX')])
-                        if volume == 99:
-                            volume = 0
-                        self.state['volume'] = volume
-                    except (ValueError, IndexError):
-                        pass
-            
-        # Mute query
-        elif cmd == 'MU?':
-            self.state['muted'] = (lines[0] == 'MUON')
-            
-        # Source query
-        elif cmd == 'SI?':
-            if lines[0].startswith('SI'):
-                self.state['source'] = lines[0][len('SI'):]
+        self._confirmed[cmd] = time.monotonic()
+        for line in lines:
+            update = parse_line(line)
+            if update is not None and update.query == cmd:
+                self._confirm_command(update)
+                changed = self._apply_update(update)
+                if changed:
+                    changes.setdefault(update.zone, set()).update(changed)
+        return changes
+    
+    def _update_state_from_replies(self, replies):
+        """Update internal state from the replies to several queries. Returns the changed fields per zone."""
+        changes = {}
+        for cmd, lines in replies.items():
+            if cmd.endswith('?'):
+                for zone, fields in self._update_state_from_response(cmd, lines).items():
+                    changes.setdefault(zone, set()).update(fields)
+        return changes
+    
+    def _note_written(self, cmds):
+        """Remember when the set commands just written went out, to tell their echoes from pushed lines."""
+        written = time.monotonic()
+        for cmd in cmds:
+            if not cmd.endswith('?'):
+                self._written[cmd[:2]] = written
+    
+    def _arm_confirmations(self, cmds):
+        """Let status lines from now on confirm the set commands just written."""
+        written = time.monotonic()
+        for waiters in self._confirmations.values():
+            for confirmation in waiters:
+                if confirmation.written is None and confirmation.cmd in cmds:
+                    confirmation.written = written
+    
+    def _confirm_command(self, update):
+        """Wake the set commands written before that update reports as taken. Returns whether there were any."""
+        confirmed = False
+        for confirmation in self._confirmations.get((update.query, update.zone), ()):
+            if (confirmation.written is not None and not confirmation.future.done()
+                    and self._reports(update.zone, confirmation.fields, update.fields)):
+                confirmation.future.set_result(None)
+                confirmed = True
+        return confirmed
+    
+    def _reports(self, zone, fields, reported):
+        """Return whether the reported values match the commanded fields, allowing for clamped volumes."""
+        for name, value in fields.items():
+            if name not in reported:
+                return False
+            if reported[name] != value:
+                volume_max = self.state.volume_max if zone is None else DEFAULT_ZONE_VOLUME_MAX
+                if name != 'volume' or not reported[name] == volume_max < value:
+                    return False
+        return True
+    
+    def _apply_update(self, update):
+        """Apply a parsed status update to the state. Returns the changed fields, None for zones that aren't set up."""
+        if update.zone is None:
+            return self.state.apply(update.fields)
+        if update.zone in self.state.zones:
+            return self.state.zones[update.zone].apply(update.fields)
+        return None
+
+class _SharedEventLoop(object):
+    """Event loop thread shared by every blocking Denon232Receiver, running while any is open."""
+
+    def __init__(self):
+        """Initialize without starting the thread."""
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._users = 0
+
+    def acquire(self):
+        """Return the running loop, starting it for the first user."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='denon232', daemon=True)
+                self._thread.start()
+            self._users += 1
+            return self._loop
+
+    def release(self):
+        """Drop one user, stopping the loop once the last one is gone."""
+        with self._lock:
+            self._users -= 1
+            if self._users:
+                return
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+_shared_loop = _SharedEventLoop()
+
+class Denon232Receiver(object):
+    def __init__(self, serial_port, timeout=DEFAULT_TIMEOUT, write_timeout=DEFAULT_WRITE_TIMEOUT,
+                 line_gap=DEFAULT_LINE_GAP, command_spacing=DEFAULT_COMMAND_SPACING,
+                 byte_delay=DEFAULT_BYTE_DELAY, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 keepalive=DEFAULT_KEEPALIVE, capture_size=0, confirm_timeout=0):
+        """
+        Blocking interface to an AsyncDenon232Receiver.
+
+        All blocking receivers of the process share one event loop thread
+        that does the I/O of every port, so the thread count stays the same
+        however many receivers are open. Every call blocks until the matching
+        coroutine has finished there.
+        """
+        self._loop = _shared_loop.acquire()
+        self._receiver = AsyncDenon232Receiver(
+            serial_port,
+            timeout=timeout,
+            line_gap=line_gap,
+            command_spacing=command_spacing,
+            byte_delay=byte_delay,
+            connect_timeout=connect_timeout,
+            keepalive=keepalive,
+            capture_size=capture_size,
+            confirm_timeout=confirm_timeout
+        )
+        
+        try:
+            self._run(self._receiver.connect())
             
-        # Sound mode query
-        elif cmd == 'MS?':
-            if lines[0].startswith('MS'):
-                self.state['sound_mode'] = lines[0][len('MS'):]
-        
-        # Zone queries
-        for zone_id in list(self.state['zones'].keys()):
-            if cmd == f'{zone_id}?':
-                for line in lines:
-                    if line.startswith(zone_id):
-                        if line.endswith('ON'):
-                            self.state['zones'][zone_id]['power'] = 'ON'
-                        elif line.endswith('OFF'):
-                            self.state['zones'][zone_id]['power'] = 'OFF'
-                        elif line[len(zone_id):].isdigit():
-                            try:
-                                volume = int(line[len(zone_id):len(zone_id) + 2])
-                                if volume == 99:
-                                    volume = 0
-                                self.state['zones'][zone_id]['volume'] = volume
-                            except (ValueError, IndexError):
-                                pass
-                        else:
-                            # Assume it's the source
-                            self.state['zones'][zone_id]['source'] = line[len(zone_id):]
+            # Get initial state
+            self._run(self._receiver.initialize_state())
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def state(self):
+        """Return the cached receiver state."""
+        return self._receiver.state
+
+    @property
+    def stats(self):
+        """Return the serial link statistics."""
+        return self._receiver.stats
+
+    @property
+    def available(self):
+        """Return whether the link to the receiver is up."""
+        return self._receiver.available
+
+    @property
+    def capture(self):
+        """Return the wire capture, or None when not capturing."""
+        return self._receiver.capture
+
+    def _run(self, coro):
+        """Run a coroutine on the receiver's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def initialize_connection(self):
+        """Initialize the connection to the receiver."""
+        self._run(self._receiver.initialize_connection())
+
+    def initialize_state(self):
+        """Get the initial state from the receiver."""
+        return self._run(self._receiver.initialize_state())
+
+    def serial_command(self, cmd, response=False, all_lines=False, update_state=True):
+        """Send command to receiver and optionally update internal state."""
+        return self._run(self._receiver.serial_command(cmd, response, all_lines, update_state))
+
+    def query_status(self, queries, update_state=True):
+        """Send several status queries back to back and return the reply lines per query."""
+        return self._run(self._receiver.query_status(queries, update_state))
+
+    def send_commands(self, cmds, update_state=True):
+        """Send several commands to the receiver in one go without waiting for responses."""
+        self._run(self._receiver.send_commands(cmds, update_state))
+
+    def send_batch(self, cmds):
+        """Send an ordered list of commands as one burst and return the timing of each step."""
+        return self._run(self._receiver.send_batch(cmds))
+
+    def add_listener(self, callback):
+        """Register a callback for state updates, called from the shared event loop thread so it must not block."""
+        return self._receiver.add_listener(callback)
+
+    async def _close(self):
+        """Close the receiver on its event loop."""
+        self._receiver.close()
+        # Let the cancelled queue worker wind down before the loop stops
+        await asyncio.sleep(0)
+
+    def close(self):
+        """Close the serial connection, the event loop thread stops with the last receiver."""
+        if self._loop is None:
+            return
+        try:
+            self._run(self._close())
+        finally:
+            self._loop = None
+            _shared_loop.release()
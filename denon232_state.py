@@ -0,0 +1,55 @@
+"""State model of a Denon receiver and its zones."""
+
+class _State(object):
+    """Base for the state models, the fields are the slots."""
+
+    __slots__ = ()
+
+    def apply(self, fields):
+        """Set the given fields and return the names of those whose value changed."""
+        changed = set()
+        for name, value in fields.items():
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed.add(name)
+        return changed
+
+    def as_dict(self):
+        """Return the fields as a dict, e.g. for storing or diagnostics."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        """Return the fields for debug logging."""
+        return f'{type(self).__name__}({self.as_dict()})'
+
+class ZoneState(_State):
+    """State of zone 2 or 3. Power is ON or OFF."""
+
+    __slots__ = ('power', 'volume', 'source')
+
+    def __init__(self, power='OFF', volume=0, source=''):
+        """Initialize the zone state."""
+        self.power = power
+        self.volume = volume
+        self.source = source
+
+class MainState(_State):
+    """State of the main zone, with the states of the other zones. Power is PWON or PWSTANDBY."""
+
+    __slots__ = ('power', 'volume', 'volume_max', 'muted', 'source', 'sound_mode', 'zones')
+
+    def __init__(self, zone_ids=()):
+        """Initialize the state with defaults until the receiver reports."""
+        self.power = 'PWSTANDBY'
+        self.volume = 0
+        self.volume_max = 80
+        self.muted = False
+        self.source = ''
+        self.sound_mode = ''
+        self.zones = {zone_id: ZoneState() for zone_id in zone_ids}
+
+    def as_dict(self):
+        """Return the fields as a dict, zone states included."""
+        state = super().as_dict()
+        state['zones'] = {zone_id: zone.as_dict() for zone_id, zone in self.zones.items()}
+        return state
@@ -0,0 +1,162 @@
+"""
+Transports to a Denon receiver's RS232 port.
+
+Besides a local serial device the port can be reached through a network
+serial bridge, either raw TCP as offered by ser2net (socket://host:port) or
+RFC 2217 (rfc2217://host:port).
+"""
+import asyncio
+import functools
+import logging
+import socket
+import threading
+import urllib.parse
+
+import serial
+import serial_asyncio_fast
+
+DEFAULT_CONNECT_TIMEOUT = 5  # Seconds to wait for the port or bridge to open
+DEFAULT_KEEPALIVE = 30  # Idle seconds before TCP keepalive probes are sent, 0 disables them
+KEEPALIVE_PROBES = 3  # Unanswered keepalive probes after which the connection is dropped
+READ_POLL_TIMEOUT = 0.5  # Seconds a blocking read waits before checking for close
+
+# Line settings required by the Denon spec
+SERIAL_SETTINGS = {
+    'baudrate': 9600,
+    'bytesize': serial.EIGHTBITS,
+    'parity': serial.PARITY_NONE,
+    'stopbits': serial.STOPBITS_ONE,
+}
+
+_LOGGER = logging.getLogger(__name__)
+
+def is_network_url(url):
+    """Return whether the port is reached through a network serial bridge."""
+    return urllib.parse.urlparse(url).scheme in ('socket', 'rfc2217')
+
+async def create_connection(protocol_factory, url, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                            keepalive=DEFAULT_KEEPALIVE):
+    """
+    Open a transport to the receiver and return it with its protocol.
+
+    Args:
+        protocol_factory (callable): Returns the asyncio protocol for the connection
+        url (str): Local serial device, socket://host:port or rfc2217://host:port
+        connect_timeout (float): Seconds to wait for the connection to open
+        keepalive (int): Idle seconds before TCP keepalive probes, 0 disables them
+    """
+    loop = asyncio.get_running_loop()
+    parsed = urllib.parse.urlparse(url)
+    try:
+        if parsed.scheme == 'socket':
+            transport, protocol = await asyncio.wait_for(
+                loop.create_connection(protocol_factory, parsed.hostname, parsed.port),
+                connect_timeout
+            )
+            configure_socket(transport.get_extra_info('socket'), keepalive)
+        elif parsed.scheme == 'rfc2217':
+            instance = await asyncio.wait_for(
+                loop.run_in_executor(None, functools.partial(
+                    serial.serial_for_url, url, timeout=READ_POLL_TIMEOUT, **SERIAL_SETTINGS
+                )),
+                connect_timeout
+            )
+            configure_socket(instance._socket, keepalive)
+            protocol = protocol_factory()
+            transport = ThreadedSerialTransport(loop, protocol, instance)
+        else:
+            transport, protocol = await asyncio.wait_for(
+                serial_asyncio_fast.create_serial_connection(loop, protocol_factory, url, **SERIAL_SETTINGS),
+                connect_timeout
+            )
+    except asyncio.TimeoutError:
+        raise serial.SerialException(f"Timed out opening {url}") from None
+
+    _LOGGER.debug("Opened %s", url)
+    return transport, protocol
+
+def configure_socket(sock, keepalive=DEFAULT_KEEPALIVE):
+    """
+    Tune a serial bridge socket for short command frames.
+
+    Nagle's algorithm is disabled so every command goes out right away. With
+    keepalive a bridge that went away silently is noticed even while no
+    commands are sent.
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if not keepalive:
+        return
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, keepalive)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, keepalive // KEEPALIVE_PROBES))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, KEEPALIVE_PROBES)
+    elif hasattr(socket, 'TCP_KEEPALIVE'):
+        # macOS only knows the idle time
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, keepalive)
+
+class ThreadedSerialTransport(asyncio.Transport):
+    """
+    Transport for pyserial ports without a file descriptor, such as RFC 2217.
+
+    A daemon thread does the blocking reads and hands the data to the event
+    loop. Writes go straight to the port, command frames are only a few bytes.
+    """
+
+    def __init__(self, loop, protocol, serial_instance):
+        """Start reading from an open serial instance on behalf of the protocol."""
+        super().__init__({'serial': serial_instance})
+        self._loop = loop
+        self._protocol = protocol
+        self._serial = serial_instance
+        self._closing = False
+        self._thread = threading.Thread(
+            target=self._read_loop, name=f'denon232 {serial_instance.port}', daemon=True
+        )
+        loop.call_soon(protocol.connection_made, self)
+        self._thread.start()
+
+    def _read_loop(self):
+        """Read from the port until it is closed or fails."""
+        exc = None
+        try:
+            while not self._closing:
+                data = self._serial.read(self._serial.in_waiting or 1)
+                if data:
+                    self._loop.call_soon_threadsafe(self._protocol.data_received, data)
+        except (serial.SerialException, OSError) as err:
+            exc = err
+        if not self._closing:
+            self._loop.call_soon_threadsafe(self._connection_lost, exc)
+
+    def write(self, data):
+        """Write data to the port."""
+        if self._closing:
+            return
+        try:
+            self._serial.write(data)
+        except (serial.SerialException, OSError) as exc:
+            self._loop.call_soon(self._connection_lost, exc)
+
+    def is_closing(self):
+        """Return whether the transport is closed or closing."""
+        return self._closing
+
+    def close(self):
+        """Close the port, the protocol is told on the next loop iteration."""
+        if self._closing:
+            return
+        self._closing = True
+        self._serial.close()
+        self._loop.call_soon(self._protocol.connection_lost, None)
+
+    def _connection_lost(self, exc):
+        """Close the port after a failure and report it to the protocol."""
+        if self._closing:
+            return
+        self._closing = True
+        try:
+            self._serial.close()
+        except (serial.SerialException, OSError):
+            pass
+        self._protocol.connection_lost(exc)
@@ -0,0 +1,25 @@
+"""Diagnostics support for Denon232."""
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, DATA_COORDINATOR, DATA_RECEIVER
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """
+    Return the receiver state, serial link statistics and refresh interval of a config entry.
+    
+    With capture enabled the latest serial traffic is included in the dump
+    format of denon232_capture, it can be replayed with tools/replay.py.
+    """
+    data = hass.data[DOMAIN][entry.entry_id]
+    receiver = data[DATA_RECEIVER]
+    coordinator = data[DATA_COORDINATOR]
+    return {
+        "config": dict(entry.data),
+        "state": receiver.state.as_dict(),
+        "stale_queries": receiver.stale_queries(),
+        "link": receiver.stats.as_dict(),
+        "refresh_interval": coordinator.update_interval.total_seconds(),
+        "refresh_interval_reason": coordinator.interval_reason,
+        "capture": receiver.capture.dump() if receiver.capture is not None else None,
+    }
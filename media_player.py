@@ -1,22 +1,53 @@
 import voluptuous as vol
 from datetime import timedelta
 import logging
+import serial
+import time
 
 from homeassistant.components.media_player import (MediaPlayerEntity, PLATFORM_SCHEMA)
 from homeassistant.components.media_player.const import MediaPlayerEntityFeature
 from homeassistant.const import (CONF_NAME, STATE_OFF, STATE_ON)
+from homeassistant.core import SupportsResponse, callback
+from homeassistant.helpers import entity_platform
 from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 import homeassistant.helpers.config_validation as cv
 
-from .denon232_receiver import Denon232Receiver
-from .const import (DOMAIN, CONF_ZONES, CONF_DEVICE, CONF_NAME, RECEIVER_INPUTS, SOUND_MODES, LOGGER)
-from homeassistant.helpers.dispatcher import async_dispatcher_connect, async_dispatcher_send
+from .const import (DOMAIN, CONF_ZONES, CONF_NAME, DATA_COORDINATOR, RECEIVER_INPUTS, SOUND_MODES, LOGGER)
+from .denon232_protocol import ZONE_IDS
+from .denon232_receiver import DEFAULT_ZONE_VOLUME_MAX, ZONE_DISCOVERY_MAX_AGE
 
-SIGNAL_DENON_UPDATE = "denon_update"
+# Interval for checking whether the zones the receiver is known to have are out
+# of date. They are probed once they are ZONE_DISCOVERY_MAX_AGE old, as that
+# age survives restarts, frequent restarts don't hold the probe off.
+ZONE_DISCOVERY_CHECK_INTERVAL = timedelta(hours=1)
 
-# Default refresh interval (seconds)
-DEFAULT_REFRESH_INTERVAL = 60
+SERVICE_SEND_BATCH = "send_batch"
+ATTR_COMMANDS = "commands"
+
+def validate_batch_command(value):
+    """Validate a command for send_batch, sources and sound modes must be known ones."""
+    cmd = cv.string(value).strip()
+    prefix, value = cmd[:2], cmd[2:]
+    if (
+        (prefix == 'PW' and value in ('ON', 'STANDBY'))
+        or (prefix == 'MV' and (value in ('UP', 'DOWN') or (value.isdigit() and len(value) in (2, 3))))
+        or (prefix == 'MU' and value in ('ON', 'OFF'))
+        or (prefix == 'SI' and value in RECEIVER_INPUTS.values())
+        or (prefix == 'MS' and value in SOUND_MODES.values())
+        or (prefix in ZONE_IDS and (
+            value in ('ON', 'OFF', 'UP', 'DOWN')
+            or (value.isdigit() and len(value) == 2)
+            or value in RECEIVER_INPUTS.values()
+        ))
+    ):
+        return cmd
+    raise vol.Invalid(f"Unsupported command: {cmd}")
+
+SEND_BATCH_SCHEMA = {
+    vol.Required(ATTR_COMMANDS): vol.All(cv.ensure_list, vol.Length(min=1), [validate_batch_command]),
+}
 
 SUPPORT_DENON_ZONE = (
     MediaPlayerEntityFeature.VOLUME_SET | 
@@ -36,10 +67,51 @@ SUPPORT_DENON = (
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up the Denon AVR entities from config entry."""
     config = hass.data[DOMAIN][config_entry.entry_id]
-    receiver = Denon232Receiver(config[CONF_DEVICE])
+    configured_zones = [zone["zone_id"] for zone in config[CONF_ZONES]]
+    coordinator = config[DATA_COORDINATOR]
+    receiver = coordinator.receiver
+    
+    async def async_rediscover_zones(_now=None):
+        """
+        Check the receiver for zones that can be added through the config flow.
+        
+        The receiver is only probed if the zones it is known to have, for
+        example from the snapshot, are out of date. Zones that aren't set up
+        are reported at setup and after each probe.
+        """
+        zones = receiver.known_zones(ZONE_DISCOVERY_MAX_AGE)
+        if zones is not None and _now is not None:
+            return
+        if zones is None:
+            try:
+                zones = await receiver.discover_zones()
+            except serial.SerialException as exc:
+                # Checked again with the next interval
+                LOGGER.debug("Zone discovery on %s skipped: %s", config[CONF_NAME], exc)
+                return
+        if missing := [zone_id for zone_id in zones if zone_id not in configured_zones]:
+            LOGGER.info(
+                "Receiver %s supports zones that aren't configured: %s",
+                config[CONF_NAME], ", ".join(missing)
+            )
+    
+    config_entry.async_on_unload(
+        async_track_time_interval(hass, async_rediscover_zones, ZONE_DISCOVERY_CHECK_INTERVAL)
+    )
+    config_entry.async_create_background_task(
+        hass, async_rediscover_zones(), f"{DOMAIN} zone discovery"
+    )
+    
+    platform = entity_platform.async_get_current_platform()
+    platform.async_register_entity_service(
+        SERVICE_SEND_BATCH,
+        SEND_BATCH_SCHEMA,
+        "async_send_batch",
+        supports_response=SupportsResponse.OPTIONAL
+    )
     
     entities = []
-    main_entity = Denon232Device(config[CONF_NAME], config_entry.unique_id, receiver, hass)
+    main_entity = Denon232Device(config[CONF_NAME], config_entry.unique_id, coordinator)
     entities.append(main_entity)
     
     # Set up zone entities
@@ -47,91 +119,40 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
         entities.append(Denon232Zone(
             f"{config[CONF_NAME]} {zone['zone_name']}", 
             config_entry.unique_id, 
-            receiver, 
-            zone["zone_id"], 
-            hass
+            coordinator, 
+            zone["zone_id"]
         ))
     
     async_add_entities(entities)
 
-class Denon232Device(MediaPlayerEntity):
+async def _async_send_batch(receiver, commands):
+    """Send a batch for the send_batch service and build its response."""
+    started = time.monotonic()
+    steps = await receiver.send_batch(commands)
+    return {
+        "duration_ms": round((time.monotonic() - started) * 1000, 2),
+        "steps": steps,
+    }
+
+class Denon232Device(CoordinatorEntity, MediaPlayerEntity):
     """Representation of a Denon AVR device."""
     
-    def __init__(self, name, unique_id, receiver, hass):
+    def __init__(self, name, unique_id, coordinator):
         """Initialize the device."""
-        super().__init__()
+        super().__init__(coordinator)
         self._attr_unique_id = unique_id
         self._name = name
-        self._denon232_receiver = receiver
-        self._hass = hass
-        
-        # Flag to track when a full refresh is needed
-        self._full_refresh_needed = True
-        
-        # Track periodic refresh registration
-        self._refresh_unsub = None
-        
-        # Initialize state from cached values
-        self._initialize_from_cache()
-        
-        # Connect the update signal
-        async_dispatcher_connect(self._hass, SIGNAL_DENON_UPDATE, self._handle_denon_update)
-    
-    async def async_added_to_hass(self):
-        """Set up the entity when added to hass."""
-        await super().async_added_to_hass()
-        
-        # Set up periodic refresh
-        self._refresh_unsub = async_track_time_interval(
-            self.hass, 
-            self._handle_periodic_refresh,
-            timedelta(seconds=DEFAULT_REFRESH_INTERVAL)
-        )
-    
-    async def async_will_remove_from_hass(self):
-        """Clean up when entity is removed."""
-        await super().async_will_remove_from_hass()
-        
-        # Cancel periodic refresh
-        if self._refresh_unsub:
-            self._refresh_unsub()
-            self._refresh_unsub = None
-    
-    def _initialize_from_cache(self):
-        """Initialize state values from the receiver cache."""
-        state = self._denon232_receiver.state
-        self._pwstate = state['power']
-        self._volume = state['volume']
-        self._volume_max = state['volume_max']
-        self._muted = state['muted']
-        self._mediasource = state['source'] 
-        self._denon_sound_mode = state['sound_mode']
+        self._denon232_receiver = coordinator.receiver
         self._source_list = RECEIVER_INPUTS.copy()
         self._sound_mode_list = SOUND_MODES.copy()
     
-    async def _handle_denon_update(self):
-        """Handle external update signal."""
-        self._full_refresh_needed = True
-        await self.async_update_ha_state()
-    
-    async def _handle_periodic_refresh(self, _now=None):
-        """Handle periodic state refresh."""
-        # Request a full state refresh from the device
-        LOGGER.debug("Performing periodic state refresh")
-        self._full_refresh_needed = True
-        
-        # Refresh state from receiver
-        await self.hass.async_add_executor_job(self._denon232_receiver.initialize_state)
-        
-        # Update HA state
-        await self.async_update_ha_state()
-    
-    async def async_update(self):
-        """Update state from the receiver cache."""
-        if self._full_refresh_needed:
-            LOGGER.debug("Refreshing device state from cache")
-            self._initialize_from_cache()
-            self._full_refresh_needed = False
+    @callback
+    def _handle_coordinator_update(self):
+        """Handle a state change, skipped when only other zones changed."""
+        changes = self.coordinator.changes
+        if changes and None not in changes:
+            return
+        self.async_write_ha_state()
     
     @property
     def device_info(self):
@@ -147,20 +168,25 @@ class Denon232Device(MediaPlayerEntity):
         """Return the name of the device."""
         return self._name
     
+    @property
+    def available(self):
+        """Return whether the link to the receiver is up."""
+        return self._denon232_receiver.available
+    
     @property
     def state(self):
         """Return the state of the device."""
-        return STATE_ON if self._pwstate == 'PWON' else STATE_OFF
+        return STATE_ON if self.coordinator.data.power == 'PWON' else STATE_OFF
     
     @property
     def volume_level(self):
         """Volume level of the media player (0..1)."""
-        return self._volume / self._volume_max
+        return self.coordinator.data.volume / self.coordinator.data.volume_max
     
     @property
     def is_volume_muted(self):
         """Return boolean if volume is currently muted."""
-        return self._muted
+        return self.coordinator.data.muted
     
     @property
     def source_list(self):
@@ -181,7 +207,7 @@ class Denon232Device(MediaPlayerEntity):
     def source(self):
         """Return the current input source."""
         for pretty_name, name in self._source_list.items():
-            if self._mediasource == name:
+            if self.coordinator.data.source == name:
                 return pretty_name
         return None
     
@@ -189,79 +215,61 @@ class Denon232Device(MediaPlayerEntity):
     def sound_mode(self):
         """Return the current sound mode."""
         for pretty_name, name in self._sound_mode_list.items():
-            if self._denon_sound_mode == name:
+            if self.coordinator.data.sound_mode == name:
                 return pretty_name
         return None
     
+    # The receiver updates its state as each command goes out and the
+    # coordinator passes the change on, the actions don't write state themselves
+    
     async def async_turn_on(self):
         """Turn the media player on."""
-        await self.hass.async_add_executor_job(self._denon232_receiver.serial_command, 'PWON')
-        # State is updated in the receiver, refresh our local copy
-        self._pwstate = self._denon232_receiver.state['power']
-        self.async_write_ha_state()
+        await self._denon232_receiver.serial_command('PWON')
     
     async def async_turn_off(self):
         """Turn off media player."""
-        await self.hass.async_add_executor_job(self._denon232_receiver.serial_command, 'PWSTANDBY')
-        # State is updated in the receiver, refresh our local copy
-        self._pwstate = self._denon232_receiver.state['power']
-        self.async_write_ha_state()
+        await self._denon232_receiver.serial_command('PWSTANDBY')
     
     async def async_volume_up(self):
         """Volume up media player asynchronously."""
-        await self.hass.async_add_executor_job(self._denon232_receiver.serial_command, 'MVUP')
-        # State is updated in the receiver, refresh our local copy
-        self._volume = self._denon232_receiver.state['volume']
-        LOGGER.debug("Volume up pressed. New volume level: %s", self._volume)
-        self.async_write_ha_state()
+        await self._denon232_receiver.serial_command('MVUP')
+        LOGGER.debug("Volume up pressed. New volume level: %s", self.coordinator.data.volume)
     
     async def async_volume_down(self):
         """Volume down media player asynchronously."""
-        await self.hass.async_add_executor_job(self._denon232_receiver.serial_command, 'MVDOWN')
-        # State is updated in the receiver, refresh our local copy
-        self._volume = self._denon232_receiver.state['volume']
-        LOGGER.debug("Volume down pressed. New volume level: %s", self._volume)
-        self.async_write_ha_state()
+        await self._denon232_receiver.serial_command('MVDOWN')
+        LOGGER.debug("Volume down pressed. New volume level: %s", self.coordinator.data.volume)
     
     async def async_set_volume_level(self, volume):
         """Set volume level asynchronously."""
-        absolute_volume = round(volume * self._volume_max)
+        absolute_volume = round(volume * self.coordinator.data.volume_max)
         command = 'MV' + str(absolute_volume).zfill(2)
-        await self.hass.async_add_executor_job(self._denon232_receiver.serial_command, command)
-        # State is updated in the receiver, refresh our local copy
-        self._volume = self._denon232_receiver.state['volume']
-        LOGGER.debug("Volume Level Set: %s", self._volume)
-        self.async_write_ha_state()
+        # The new level shows right away, the receiver coalesces slider bursts
+        await self._denon232_receiver.serial_command(command)
+        LOGGER.debug("Volume Level Set: %s", absolute_volume)
     
     async def async_mute_volume(self, mute):
         """Mute (true) or unmute (false) media player asynchronously."""
         command = 'MU' + ('ON' if mute else 'OFF')
-        await self.hass.async_add_executor_job(self._denon232_receiver.serial_command, command)
-        # State is updated in the receiver, refresh our local copy
-        self._muted = self._denon232_receiver.state['muted']
-        self.async_write_ha_state()
+        await self._denon232_receiver.serial_command(command)
     
     async def async_select_source(self, source):
         """Select input source asynchronously."""
         command = 'SI' + self._source_list.get(source)
-        await self.hass.async_add_executor_job(self._denon232_receiver.serial_command, command)
-        # State is updated in the receiver, refresh our local copy
-        self._mediasource = self._denon232_receiver.state['source']
-        self.async_write_ha_state()
+        await self._denon232_receiver.serial_command(command)
     
     async def async_select_sound_mode(self, sound_mode):
         """Select sound mode asynchronously."""
         command = self._sound_mode_list.get(sound_mode)
         if command:
-            await self.hass.async_add_executor_job(
-                self._denon232_receiver.serial_command, f'MS{command}'
-            )
-            # State is updated in the receiver, refresh our local copy
-            self._denon_sound_mode = self._denon232_receiver.state['sound_mode']
-            self.async_write_ha_state()
+            await self._denon232_receiver.serial_command(f'MS{command}')
         else:
             LOGGER.error(f'Invalid sound mode selected: {sound_mode}')
     
+    async def async_send_batch(self, commands):
+        """Send commands to the receiver in one burst and return the timing of each step."""
+        return await _async_send_batch(self._denon232_receiver, commands)
+    
     async def async_play_media(self, media_type, media_id, **kwargs):
         """Play radio station by preset number or frequency asynchronously."""
         if self.source == 'Tuner':
@@ -269,65 +277,35 @@ class Denon232Device(MediaPlayerEntity):
                 valid_prefix = media_id[0] in ['A', 'B', 'C', 'D', 'E', 'F', 'G']
                 valid_number = media_id[1].isdigit() and 0 <= int(media_id[1]) <= 8
                 if valid_prefix and valid_number:
-                    await self.hass.async_add_executor_job(
-                        self._denon232_receiver.serial_command, 'TP' + media_id
-                    )
+                    await self._denon232_receiver.serial_command('TP' + media_id)
                 elif media_id.isdigit() and 8800 <= int(media_id) <= 10800:
-                    await self.hass.async_add_executor_job(
-                        self._denon232_receiver.serial_command, 'TF' + media_id.zfill(6)
-                    )
-            self.async_write_ha_state()
+                    await self._denon232_receiver.serial_command('TF' + media_id.zfill(6))
 
-class Denon232Zone(MediaPlayerEntity):
+class Denon232Zone(CoordinatorEntity, MediaPlayerEntity):
     """Representation of a Denon Zone."""
     
-    def __init__(self, name, unique_id, denon232_receiver, zone_identifier, hass):
+    def __init__(self, name, unique_id, coordinator, zone_identifier):
         """Initialize the Denon Receiver Zone."""
-        super().__init__()
+        super().__init__(coordinator)
         self._attr_unique_id = f'{unique_id}_{zone_identifier}'
         self._name = name
         self._zid = zone_identifier
-        self._denon232_receiver = denon232_receiver
-        self._hass = hass
-        
-        # Flag to track when a full refresh is needed
-        self._full_refresh_needed = True
-        
-        # Initialize state from cached values
-        self._initialize_from_cache()
-        
-        # Connect the update signal
-        async_dispatcher_connect(self._hass, SIGNAL_DENON_UPDATE, self._handle_denon_update)
-    
-    def _initialize_from_cache(self):
-        """Initialize state values from the receiver cache."""
-        zone_state = self._denon232_receiver.state['zones'].get(self._zid, {})
-        
-        if zone_state:
-            self._pwstate = f"{self._zid}{'ON' if zone_state.get('power') == 'ON' else 'OFF'}"
-            self._volume = zone_state.get('volume', 0)
-            self._volume_max = 60  # Default value, specific to zones
-            self._mediasource = zone_state.get('source', '')
-        else:
-            # Default values if zone not in cache
-            self._pwstate = f'{self._zid}OFF'
-            self._volume = 0
-            self._volume_max = 60
-            self._mediasource = ''
-        
+        self._denon232_receiver = coordinator.receiver
+        self._volume_max = DEFAULT_ZONE_VOLUME_MAX  # Zones don't report a maximum
         self._source_list = RECEIVER_INPUTS.copy()
     
-    async def _handle_denon_update(self):
-        """Handle external update signal."""
-        self._full_refresh_needed = True
-        await self.async_update_ha_state()
-    
-    async def async_update(self):
-        """Update zone state from the receiver cache."""
-        if self._full_refresh_needed:
-            LOGGER.debug(f"Refreshing zone {self._zid} state from cache")
-            self._initialize_from_cache()
-            self._full_refresh_needed = False
+    @property
+    def _zone_state(self):
+        """Return the cached state of the zone."""
+        return self.coordinator.data.zones[self._zid]
+    
+    @callback
+    def _handle_coordinator_update(self):
+        """Handle a state change, skipped when this zone didn't change."""
+        changes = self.coordinator.changes
+        if changes and self._zid not in changes:
+            return
+        self.async_write_ha_state()
     
     @property
     def device_info(self):
@@ -344,15 +322,20 @@ class Denon232Zone(MediaPlayerEntity):
         """Return the name of the zone."""
         return self._name
     
+    @property
+    def available(self):
+        """Return whether the link to the receiver is up."""
+        return self._denon232_receiver.available
+    
     @property
     def state(self):
         """Return the state of the zone."""
-        return STATE_OFF if self._pwstate.endswith('OFF') else STATE_ON
+        return STATE_ON if self._zone_state.power == 'ON' else STATE_OFF
     
     @property
     def volume_level(self):
         """Volume level of the media player (0..1)."""
-        return self._volume / self._volume_max
+        return self._zone_state.volume / self._volume_max
     
     @property
     def source_list(self):
@@ -369,86 +352,38 @@ class Denon232Zone(MediaPlayerEntity):
         """Return the current input source."""
         return next(
             (pretty_name for pretty_name, name in self._source_list.items() 
-             if self._mediasource == name), 
+             if self._zone_state.source == name), 
             None
         )
     
     async def async_turn_on(self):
         """Turn the media player zone on asynchronously."""
-        await self._hass.async_add_executor_job(
-            self._denon232_receiver.serial_command, f'{self._zid}ON'
-        )
-        # Update internal state
-        zone_state = self._denon232_receiver.state['zones'].get(self._zid, {})
-        if zone_state:
-            self._pwstate = f"{self._zid}{'ON' if zone_state.get('power') == 'ON' else 'OFF'}"
-        else:
-            self._pwstate = f'{self._zid}ON'  # Fallback
-        self.async_write_ha_state()
+        await self._denon232_receiver.serial_command(f'{self._zid}ON')
     
     async def async_turn_off(self):
         """Turn off media player asynchronously."""
-        await self._hass.async_add_executor_job(
-            self._denon232_receiver.serial_command, f'{self._zid}OFF'
-        )
-        # Update internal state
-        zone_state = self._denon232_receiver.state['zones'].get(self._zid, {})
-        if zone_state:
-            self._pwstate = f"{self._zid}{'ON' if zone_state.get('power') == 'ON' else 'OFF'}"
-        else:
-            self._pwstate = f'{self._zid}OFF'  # Fallback
-        self.async_write_ha_state()
+        await self._denon232_receiver.serial_command(f'{self._zid}OFF')
     
     async def async_volume_up(self):
         """Volume up media player asynchronously."""
-        await self._hass.async_add_executor_job(
-            self._denon232_receiver.serial_command, f'{self._zid}UP'
-        )
-        # Update internal state
-        zone_state = self._denon232_receiver.state['zones'].get(self._zid, {})
-        if zone_state:
-            self._volume = zone_state.get('volume', self._volume)
-        else:
-            self._volume = min(self._volume + 1, self._volume_max)  # Fallback
-        self.async_write_ha_state()
+        await self._denon232_receiver.serial_command(f'{self._zid}UP')
     
     async def async_volume_down(self):
         """Volume down media player asynchronously."""
-        await self._hass.async_add_executor_job(
-            self._denon232_receiver.serial_command, f'{self._zid}DOWN'
-        )
-        # Update internal state
-        zone_state = self._denon232_receiver.state['zones'].get(self._zid, {})
-        if zone_state:
-            self._volume = zone_state.get('volume', self._volume)
-        else:
-            self._volume = max(self._volume - 1, 0)  # Fallback
-        self.async_write_ha_state()
+        await self._denon232_receiver.serial_command(f'{self._zid}DOWN')
     
     async def async_set_volume_level(self, volume):
         """Set volume level asynchronously, range 0..1."""
-        command = f'{self._zid}{str(round(volume * self._volume_max)).zfill(2)}'
-        await self._hass.async_add_executor_job(
-            self._denon232_receiver.serial_command, command
-        )
-        # Update internal state
-        zone_state = self._denon232_receiver.state['zones'].get(self._zid, {})
-        if zone_state:
-            self._volume = zone_state.get('volume', self._volume)
-        else:
-            self._volume = round(volume * self._volume_max)  # Fallback
-        self.async_write_ha_state()
+        absolute_volume = round(volume * self._volume_max)
+        command = f'{self._zid}{str(absolute_volume).zfill(2)}'
+        # The new level shows right away, the receiver coalesces slider bursts
+        await self._denon232_receiver.serial_command(command)
     
     async def async_select_source(self, source):
         """Select input source asynchronously."""
         command = f'{self._zid}{self._source_list.get(source)}'
-        await self._hass.async_add_executor_job(
-            self._denon232_receiver.serial_command, command
-        )
-        # Update internal state
-        zone_state = self._denon232_receiver.state['zones'].get(self._zid, {})
-        if zone_state:
-            self._mediasource = zone_state.get('source', self._mediasource)
-        else:
-            self._mediasource = self._source_list.get(source, self._mediasource)  # Fallback
-        self.async_write_ha_state()
+        await self._denon232_receiver.serial_command(command)
+    
+    async def async_send_batch(self, commands):
+        """Send commands to the receiver in one burst and return the timing of each step."""
+        return await _async_send_batch(self._denon232_receiver, commands)
@@ -0,0 +1,115 @@
+"""Diagnostic sensors for the serial link of a Denon232 receiver."""
+from dataclasses import dataclass
+from typing import Callable
+
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass
+)
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN, CONF_NAME, DATA_COORDINATOR
+
+@dataclass(frozen=True, kw_only=True)
+class Denon232SensorEntityDescription(SensorEntityDescription):
+    """Describes a link statistic and how to read it from the receiver's LinkStats."""
+
+    value_fn: Callable
+
+SENSORS = (
+    Denon232SensorEntityDescription(
+        key="response_time",
+        name="Response time",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda stats: stats.timings['response'].as_dict()['p95_ms'],
+    ),
+    Denon232SensorEntityDescription(
+        key="first_byte_time",
+        name="First byte time",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda stats: stats.timings['first_byte'].as_dict()['p95_ms'],
+    ),
+    Denon232SensorEntityDescription(
+        key="queue_wait",
+        name="Queue wait",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda stats: stats.timings['queue_wait'].as_dict()['p95_ms'],
+    ),
+    Denon232SensorEntityDescription(
+        key="refresh_duration",
+        name="Refresh duration",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda stats: stats.timings['refresh'].as_dict()['last_ms'],
+    ),
+    Denon232SensorEntityDescription(
+        key="timeouts",
+        name="Timeouts",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.timeouts,
+    ),
+    Denon232SensorEntityDescription(
+        key="unconfirmed",
+        name="Unconfirmed commands",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.unconfirmed,
+    ),
+    Denon232SensorEntityDescription(
+        key="bytes_in",
+        name="Bytes received",
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.bytes_in,
+    ),
+    Denon232SensorEntityDescription(
+        key="bytes_out",
+        name="Bytes sent",
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.bytes_out,
+    ),
+)
+
+async def async_setup_entry(hass, config_entry, async_add_entities):
+    """Set up the link statistic sensors from config entry."""
+    config = hass.data[DOMAIN][config_entry.entry_id]
+    async_add_entities(
+        Denon232LinkSensor(config[CONF_NAME], config_entry.unique_id, config[DATA_COORDINATOR], description)
+        for description in SENSORS
+    )
+
+class Denon232LinkSensor(CoordinatorEntity, SensorEntity):
+    """
+    A statistic of the serial link, disabled by default.
+
+    The statistics are read from memory whenever the coordinator refreshes
+    the receiver, whether or not its state changed, or passes on a state
+    change. There is no polling.
+    """
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, name, unique_id, coordinator, description):
+        """Initialize the sensor for the receiver's main device."""
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._device_unique_id = unique_id
+        self._attr_name = f"{name} {description.name}"
+        self._attr_unique_id = f"{unique_id}_{description.key}"
+
+    @property
+    def device_info(self):
+        """Return the device info of the receiver the statistic belongs to."""
+        return DeviceInfo(identifiers={(DOMAIN, self._device_unique_id)})
+
+    @property
+    def native_value(self):
+        """Return the statistic, no I/O involved."""
+        return self.entity_description.value_fn(self.coordinator.receiver.stats)
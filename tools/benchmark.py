@@ -0,0 +1,185 @@
+"""
+Benchmark the receiver against the emulator.
+
+Measures command round trip times, the duration of a full and an incremental
+state refresh, throughput under a sustained mix of commands and queries, and
+how much executor thread time the receiver uses. Results are written as JSON
+so they can be compared between releases.
+
+    python tools/benchmark.py --output bench.json
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import platform
+import random
+import threading
+import time
+
+import component
+from emulator import Denon232Emulator
+
+class InstrumentedExecutor(concurrent.futures.ThreadPoolExecutor):
+    """Thread pool that records how long its threads are busy."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the executor."""
+        super().__init__(*args, **kwargs)
+        self.busy = 0.0
+        self.jobs = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        """Submit a job, timing how long it runs."""
+        def timed():
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.busy += time.perf_counter() - start
+                    self.jobs += 1
+        return super().submit(timed)
+
+def summarize(samples):
+    """Return percentiles in milliseconds for a list of durations in seconds."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def percentile(share):
+        return round(ordered[min(len(ordered) - 1, round(share * (len(ordered) - 1)))] * 1000, 3)
+
+    return {
+        'count': len(ordered),
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+async def timed(coro):
+    """Await a coroutine and return how long it took."""
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+async def bench_round_trips(receiver, iterations):
+    """Time status queries and set commands one after the other."""
+    queries = ['PW?', 'MV?', 'MU?', 'SI?', 'MS?', 'Z2?']
+    query_times = []
+    for index in range(iterations):
+        query = queries[index % len(queries)]
+        query_times.append(await timed(receiver.serial_command(query, response=True, all_lines=True)))
+
+    command_times = []
+    for index in range(iterations):
+        command_times.append(await timed(receiver.serial_command(f'MV{str(20 + index % 40).zfill(2)}')))
+
+    return {'query': summarize(query_times), 'volume_set': summarize(command_times)}
+
+async def bench_refresh(receiver, iterations):
+    """Time full state initializations and refreshes of stale fields only."""
+    full = [await timed(receiver.initialize_state()) for _ in range(iterations)]
+    incremental = [await timed(receiver.refresh(0)) for _ in range(iterations)]
+    return {'initialize_state': summarize(full), 'refresh_all_stale': summarize(incremental)}
+
+async def bench_mixed_load(receiver, duration, workers, seed):
+    """Run a mix of set commands and queries from several tasks and count completions."""
+    rng = random.Random(seed)
+    commands = ['MUON', 'MUOFF', 'SICD', 'SIDVD', 'MSSTEREO', 'Z2ON', 'Z2OFF']
+    queries = ['PW?', 'MV?', 'MU?', 'SI?', 'MS?']
+    deadline = time.perf_counter() + duration
+    latencies = []
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            roll = rng.random()
+            if roll < 0.4:
+                coro = receiver.serial_command(f'MV{str(rng.randint(10, 70)).zfill(2)}')
+            elif roll < 0.7:
+                coro = receiver.serial_command(rng.choice(commands))
+            else:
+                coro = receiver.serial_command(rng.choice(queries), response=True)
+            latencies.append(await timed(coro))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    elapsed = time.perf_counter() - start
+    return {
+        'duration_s': round(elapsed, 3),
+        'workers': workers,
+        'commands_per_s': round(len(latencies) / elapsed, 1),
+        'latency': summarize(latencies),
+    }
+
+async def run(args):
+    """Run every benchmark and return the results."""
+    receiver_module = component.load('denon232_receiver')
+    emulator = Denon232Emulator(
+        zones=('Z2',), latency=args.latency, pace=not args.no_pace, seed=args.seed
+    )
+    url = emulator.start_pty()
+
+    executor = InstrumentedExecutor()
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(executor)
+    threads_before = threading.active_count()
+
+    receiver = receiver_module.AsyncDenon232Receiver(url, zones=['Z2'])
+    start = time.perf_counter()
+    await receiver.connect()
+    await receiver.initialize_state()
+    startup = time.perf_counter() - start
+    
+    # Connecting puts the unit in standby, refreshes only cover everything while it is on
+    await receiver.serial_command('PWON')
+
+    results = {
+        'startup_ms': round(startup * 1000, 3),
+        'round_trip': await bench_round_trips(receiver, args.iterations),
+        'refresh': await bench_refresh(receiver, max(1, args.iterations // 10)),
+        'mixed_load': await bench_mixed_load(receiver, args.duration, args.workers, args.seed),
+    }
+    wall = time.perf_counter() - start
+
+    receiver.close()
+    emulator.close()
+    results['executor'] = {
+        'jobs': executor.jobs,
+        'busy_s': round(executor.busy, 3),
+        'occupancy': round(executor.busy / wall, 4),
+        'extra_threads': threading.active_count() - threads_before,
+    }
+    return results
+
+def main():
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200, help='round trips per measurement')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of mixed load')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent tasks during mixed load')
+    parser.add_argument('--latency', type=float, default=0.0, help='emulated response latency')
+    parser.add_argument('--no-pace', action='store_true', help="don't pace emulated replies at 9600 baud")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    results = {
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'parameters': {
+            key: value for key, value in vars(args).items() if key != 'output'
+        },
+        'results': asyncio.run(run(args)),
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
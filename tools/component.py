@@ -0,0 +1,22 @@
+"""Import the integration's modules for the development tools."""
+import importlib
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'denon232'
+
+def load(module):
+    """
+    Import a module of the integration by name.
+
+    The integration's package __init__ sets it up in Home Assistant, so the
+    package is registered without running it. Modules that don't need Home
+    Assistant can then be imported on their own.
+    """
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [ROOT]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f'{PACKAGE}.{module}')
@@ -0,0 +1,318 @@
+"""
+Denon RS232 receiver emulator.
+
+Speaks the subset of the Denon RS232 protocol used by the integration (PW,
+MV/MVMAX, MU, SI, MS, Z2/Z3/Z1, TP/TF) on a pseudo terminal or a TCP socket,
+so the receiver code can be exercised and measured without hardware. Point
+the integration at the printed pty device, or at socket://host:port.
+
+Replies can be delayed and paced at the configured baud rate, the emulator
+can push status lines on its own like a unit being operated from the front
+panel, and faults can be injected by dropping commands or garbling replies.
+
+    python tools/emulator.py --pty --latency 0.02 --event-interval 5
+"""
+import argparse
+import os
+import random
+import socket
+import threading
+import time
+import tty
+
+SOURCES = ['PHONO', 'CD', 'TUNER', 'DVD', 'VDP', 'TV', 'DBS/SAT', 'VCR-1', 'V.AUX', 'CDR/TAPE1']
+SOUND_MODES = ['DIRECT', 'PURE DIRECT', 'STEREO', 'DOLBY PL2', 'DTS NEO:6', 'ROCK ARENA', '7CH STEREO']
+
+class Denon232Emulator(object):
+    def __init__(self, zones=('Z2',), volume_max=80, latency=0.0, baudrate=9600, pace=True,
+                 drop_rate=0.0, garble_rate=0.0, seed=None):
+        """
+        Initialize the emulated receiver.
+
+        Args:
+            zones (tuple): Zone ids the unit answers to
+            volume_max (int): Value reported as MVMAX
+            latency (float): Seconds before the unit starts answering a command
+            baudrate (int): Line speed the replies are paced at
+            pace (bool): Whether to pace replies at the baud rate
+            drop_rate (float): Share of commands silently ignored
+            garble_rate (float): Share of reply lines with a corrupted byte
+            seed (int): Seed for the fault injection and event randomness
+        """
+        self.latency = latency
+        self.byte_time = 10 / baudrate if pace else 0  # Start, 8 data and stop bit
+        self.drop_rate = drop_rate
+        self.garble_rate = garble_rate
+        self.silent = False  # Ignore everything, like a unit with its port disabled
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._clients = []
+        self._stop = threading.Event()
+        self._threads = []
+        self.received = []  # Every command received, in order
+
+        self.state = {
+            'power': 'STANDBY',
+            'volume': 40,
+            'volume_max': volume_max,
+            'muted': False,
+            'source': 'CD',
+            'sound_mode': 'STEREO',
+            'tuner_preset': 'A1',
+            'tuner_frequency': '009220',
+            'zones': {zone_id: {'power': 'OFF', 'volume': 30, 'source': 'CD'} for zone_id in zones},
+        }
+
+    def handle(self, cmd):
+        """Apply a command to the emulated state and return the lines the unit answers with."""
+        with self._lock:
+            self.received.append(cmd)
+            return self._handle(cmd)
+
+    def _handle(self, cmd):
+        """Handle a command, with the lock held."""
+        state = self.state
+        if cmd == 'PW?':
+            return [f"PW{state['power']}"]
+        if cmd in ('PWON', 'PWSTANDBY'):
+            state['power'] = cmd[2:]
+            return [cmd]
+
+        if cmd == 'MV?':
+            return [self._volume_line('MV', state['volume']), f"MVMAX {state['volume_max']}"]
+        if cmd.startswith('MV'):
+            state['volume'] = self._step(cmd[2:], state['volume'], state['volume_max'])
+            return [self._volume_line('MV', state['volume'])]
+
+        if cmd == 'MU?':
+            return ['MUON' if state['muted'] else 'MUOFF']
+        if cmd in ('MUON', 'MUOFF'):
+            state['muted'] = cmd == 'MUON'
+            return [cmd]
+
+        if cmd == 'SI?':
+            return [f"SI{state['source']}"]
+        if cmd.startswith('SI'):
+            state['source'] = cmd[2:]
+            return [cmd]
+
+        if cmd == 'MS?':
+            return [f"MS{state['sound_mode']}"]
+        if cmd.startswith('MS'):
+            state['sound_mode'] = cmd[2:]
+            return [cmd]
+
+        if cmd == 'TP?':
+            return [f"TP{state['tuner_preset']}"]
+        if cmd.startswith('TP'):
+            state['tuner_preset'] = cmd[2:]
+            return [cmd]
+        if cmd == 'TF?':
+            return [f"TF{state['tuner_frequency']}"]
+        if cmd.startswith('TF'):
+            state['tuner_frequency'] = cmd[2:]
+            return [cmd]
+
+        zone = state['zones'].get(cmd[:2])
+        if zone is not None:
+            zone_id, value = cmd[:2], cmd[2:]
+            if value == '?':
+                return [
+                    f"{zone_id}{zone['power']}",
+                    f"{zone_id}{zone['source']}",
+                    self._volume_line(zone_id, zone['volume']),
+                ]
+            if value in ('ON', 'OFF'):
+                zone['power'] = value
+                return [cmd]
+            if value in ('UP', 'DOWN') or value.isdigit():
+                zone['volume'] = self._step(value, zone['volume'], 60)
+                return [self._volume_line(zone_id, zone['volume'])]
+            zone['source'] = value
+            return [cmd]
+
+        # Unknown commands are ignored, like the real units do
+        return []
+
+    @staticmethod
+    def _step(value, volume, volume_max):
+        """Return the volume after an UP, DOWN or absolute volume command."""
+        if value == 'UP':
+            return min(volume + 1, volume_max)
+        if value == 'DOWN':
+            return max(volume - 1, 0)
+        if value.isdigit():
+            return min(int(value[:2]), volume_max)
+        return volume
+
+    @staticmethod
+    def _volume_line(prefix, volume):
+        """Format a volume status line, 0 is reported as 99 (---)."""
+        return f"{prefix}{99 if volume == 0 else str(volume).zfill(2)}"
+
+    def push(self, line):
+        """Send a status line to every connected client, like a change made on the unit."""
+        for client in list(self._clients):
+            self._send(client, [line])
+
+    def random_event(self):
+        """Change a random field as if operated from the front panel and push the status line."""
+        with self._lock:
+            state = self.state
+            choice = self._random.choice(['volume', 'source', 'sound_mode', 'mute'])
+            if choice == 'volume':
+                state['volume'] = self._random.randint(1, state['volume_max'])
+                line = self._volume_line('MV', state['volume'])
+            elif choice == 'source':
+                state['source'] = self._random.choice(SOURCES)
+                line = f"SI{state['source']}"
+            elif choice == 'sound_mode':
+                state['sound_mode'] = self._random.choice(SOUND_MODES)
+                line = f"MS{state['sound_mode']}"
+            else:
+                state['muted'] = not state['muted']
+                line = 'MUON' if state['muted'] else 'MUOFF'
+        self.push(line)
+        return line
+
+    def start_pty(self):
+        """Serve on a new pseudo terminal and return the device path to connect to."""
+        controller, device = os.openpty()
+        tty.setraw(device)
+        path = os.ttyname(device)
+
+        def write(data):
+            os.write(controller, data)
+
+        self._start_client(lambda: os.read(controller, 1024), write)
+        return path
+
+    def start_tcp(self, host='127.0.0.1', port=0):
+        """Serve on a TCP socket, like a serial bridge. Returns the bound address."""
+        server = socket.create_server((host, port))
+        server.settimeout(0.5)
+
+        def accept():
+            while not self._stop.is_set():
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self._start_client(lambda conn=conn: conn.recv(1024), conn.sendall)
+            server.close()
+
+        self._start_thread(accept)
+        return server.getsockname()[:2]
+
+    def start_events(self, interval):
+        """Push a random front panel change every interval seconds on average."""
+        def run():
+            while not self._stop.wait(self._random.expovariate(1 / interval)):
+                self.random_event()
+
+        self._start_thread(run)
+
+    def close(self):
+        """Stop serving."""
+        self._stop.set()
+
+    def _start_thread(self, target):
+        """Run target in a daemon thread."""
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _start_client(self, read, write):
+        """Serve one connection given its read and write functions."""
+        client = (write, threading.Lock())
+        self._clients.append(client)
+
+        def run():
+            buffer = b''
+            while not self._stop.is_set():
+                try:
+                    data = read()
+                except OSError:
+                    break
+                if not data:
+                    break
+                buffer += data
+                *commands, buffer = buffer.split(b'\r')
+                for command in commands:
+                    self._command_received(client, command.decode(errors='replace').strip())
+            self._clients.remove(client)
+
+        self._start_thread(run)
+
+    def _command_received(self, client, cmd):
+        """Answer a command, applying latency and fault injection."""
+        if not cmd or self.silent or self._random.random() < self.drop_rate:
+            return
+        lines = self.handle(cmd)
+        if lines:
+            if self.latency:
+                time.sleep(self.latency)
+            self._send(client, lines)
+
+    def _send(self, client, lines):
+        """Write lines to a client, paced at the line speed."""
+        write, lock = client
+        with lock:
+            for line in lines:
+                data = bytearray(f'{line}\r'.encode())
+                if self._random.random() < self.garble_rate:
+                    data[self._random.randrange(len(data) - 1)] ^= 0x20
+                try:
+                    if self.byte_time:
+                        for byte in data:
+                            write(bytes((byte,)))
+                            time.sleep(self.byte_time)
+                    else:
+                        write(bytes(data))
+                except OSError:
+                    return
+
+def main():
+    """Run the emulator from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    transport = parser.add_mutually_exclusive_group(required=True)
+    transport.add_argument('--pty', action='store_true', help='serve on a pseudo terminal')
+    transport.add_argument('--tcp', metavar='HOST:PORT', help='serve on a TCP socket')
+    parser.add_argument('--zones', default='Z2', help='comma separated zone ids, e.g. Z2,Z3')
+    parser.add_argument('--volume-max', type=int, default=80)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before answering')
+    parser.add_argument('--baudrate', type=int, default=9600)
+    parser.add_argument('--no-pace', action='store_true', help="don't pace replies at the baud rate")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='share of commands to ignore')
+    parser.add_argument('--garble-rate', type=float, default=0.0, help='share of reply lines to corrupt')
+    parser.add_argument('--event-interval', type=float, help='mean seconds between front panel changes')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    emulator = Denon232Emulator(
+        zones=tuple(zone for zone in args.zones.split(',') if zone),
+        volume_max=args.volume_max,
+        latency=args.latency,
+        baudrate=args.baudrate,
+        pace=not args.no_pace,
+        drop_rate=args.drop_rate,
+        garble_rate=args.garble_rate,
+        seed=args.seed
+    )
+    if args.pty:
+        print(f'Serving on {emulator.start_pty()}', flush=True)
+    else:
+        host, _, port = args.tcp.rpartition(':')
+        host, port = emulator.start_tcp(host or '127.0.0.1', int(port))
+        print(f'Serving on socket://{host}:{port}', flush=True)
+    if args.event_interval:
+        emulator.start_events(args.event_interval)
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        emulator.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Replay a wire capture of the receiver offline.
+
+Takes a capture in the dump format of denon232_capture, either on its own or
+as the diagnostics JSON downloaded from Home Assistant, and
+
+- feeds the received data through the line splitter, parser and state
+  updater, timing it and optionally profiling it (--profile),
+- or serves the capture on a pseudo terminal like the receiver it was taken
+  from (--serve). Each received frame is sent with its original delay after
+  the command that preceded it. With --drive a receiver is run against the
+  port, the captured commands are written to its transport as captured and
+  at their original times, and its link statistics and state are reported
+  as JSON.
+
+    python tools/replay.py capture.txt --repeat 100 --profile
+    python tools/replay.py diagnostics.json --serve --drive
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tty
+
+import component
+
+capture_module = component.load('denon232_capture')
+protocol_module = component.load('denon232_protocol')
+receiver_module = component.load('denon232_receiver')
+
+TX_MATCH_TIMEOUT = 5  # Seconds the port waits for a captured command before moving on
+
+def read_capture(path):
+    """Return the frames of a capture dump or of the capture in a diagnostics download."""
+    with open(path, encoding='utf-8') as file:
+        text = file.read()
+    if text.lstrip().startswith('{'):
+        diagnostics = json.loads(text)
+        text = diagnostics.get('data', diagnostics).get('capture')
+        if not text:
+            raise SystemExit(f'{path} holds no capture, enable it in the integration first')
+    return capture_module.load(text)
+
+def captured_zones(frames):
+    """Return the zone ids the captured receiver answered for, queries for other zones don't count."""
+    data = b''.join(frame.data for frame in frames if frame.direction == capture_module.RX)
+    return [zone_id for zone_id in protocol_module.ZONE_IDS if f'\r{zone_id}'.encode() in b'\r' + data]
+
+def parse(frames, repeat):
+    """Feed the received frames through a receiver's protocol and return the timing."""
+    received = [frame.data for frame in frames if frame.direction == capture_module.RX]
+    zones = captured_zones(frames)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        receiver = receiver_module.AsyncDenon232Receiver('replay', zones=zones)
+        protocol = receiver_module.Denon232Protocol(receiver)
+        for data in received:
+            protocol.data_received(data)
+    elapsed = time.perf_counter() - start
+
+    lines = [line.strip() for line in b''.join(received).decode(errors='replace').split('\r')]
+    lines = [line for line in lines if line]
+    unknown = sorted({line for line in lines if protocol_module.parse_line(line) is None})
+    return {
+        'frames': len(received),
+        'lines': len(lines),
+        'repeat': repeat,
+        'duration_ms': round(elapsed * 1000, 3),
+        'us_per_line': round(elapsed / max(1, len(lines) * repeat) * 1e6, 3),
+        'unknown_lines': unknown,
+        'state': receiver.state.as_dict(),
+    }
+
+class ReplayPort(object):
+    """Pseudo terminal answering like the captured receiver."""
+
+    def __init__(self, frames, speed=1.0):
+        """
+        Initialize the port.
+
+        Args:
+            frames (list): Captured frames
+            speed (float): Factor the captured delays are divided by
+        """
+        self.frames = frames
+        self.speed = speed
+        self.missed = []  # Captured commands the client didn't send in time
+        self.done = threading.Event()
+        self._received = b''
+        self._condition = threading.Condition()
+
+    def start(self):
+        """Serve on a new pseudo terminal and return the device path to connect to."""
+        self._controller, device = os.openpty()
+        tty.setraw(device)
+        threading.Thread(target=self._read, daemon=True).start()
+        threading.Thread(target=self._play, daemon=True).start()
+        return os.ttyname(device)
+
+    def _read(self):
+        """Collect what the client sends."""
+        while True:
+            try:
+                data = os.read(self._controller, 1024)
+            except OSError:
+                return
+            with self._condition:
+                self._received += data
+                self._condition.notify_all()
+
+    def _wait_for(self, data):
+        """Wait until the client sent data, dropping everything it sent before. Returns whether it did."""
+        deadline = time.monotonic() + TX_MATCH_TIMEOUT
+        with self._condition:
+            while (index := self._received.find(data)) < 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self._received = self._received[index + len(data):]
+            return True
+
+    def _play(self):
+        """Send the received frames, each timed from the command before it."""
+        anchor_captured, anchor = 0.0, time.monotonic()
+        for frame in self.frames:
+            if frame.direction == capture_module.TX:
+                if not self._wait_for(frame.data):
+                    self.missed.append(frame.data.decode(errors='replace').strip())
+                anchor_captured, anchor = frame.time, time.monotonic()
+                continue
+            delay = anchor + (frame.time - anchor_captured) / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            os.write(self._controller, frame.data)
+        self.done.set()
+
+async def drive(port, path, frames, speed):
+    """
+    Run a receiver against the replay port, writing the captured commands at their times.
+
+    The commands go straight to the receiver's transport, in captured order and
+    unchanged. Through its queue they would be reordered by priority, volume
+    steps folded together and sweeps split up, and the port would wait for
+    frames that never come. The receiver parses whatever the port answers.
+    """
+    receiver = receiver_module.AsyncDenon232Receiver(path, zones=captured_zones(frames))
+    await receiver.connect()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    written = 0
+    for frame in frames:
+        if frame.direction != capture_module.TX:
+            continue
+        delay = start + frame.time / speed - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        receiver._transport.write(frame.data)
+        receiver.stats.bytes_out += len(frame.data)
+        written += 1
+    # Let the port play the frames received after the last command
+    await loop.run_in_executor(None, port.done.wait)
+    receiver.close()
+    return {
+        'commands': written,
+        'link': receiver.stats.as_dict(),
+        'state': receiver.state.as_dict(),
+    }
+
+def main():
+    """Run the replay from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture', help='capture dump or diagnostics JSON')
+    parser.add_argument('--repeat', type=int, default=1, help='times to parse the capture')
+    parser.add_argument('--profile', action='store_true', help='profile parsing and print the hot spots')
+    parser.add_argument('--serve', action='store_true', help='serve the capture on a pseudo terminal')
+    parser.add_argument('--drive', action='store_true', help='run a receiver against the served capture')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed factor')
+    args = parser.parse_args()
+
+    frames = read_capture(args.capture)
+    if not args.serve:
+        if args.profile:
+            profile = cProfile.Profile()
+            result = profile.runcall(parse, frames, args.repeat)
+            pstats.Stats(profile).sort_stats('cumulative').print_stats(20)
+        else:
+            result = parse(frames, args.repeat)
+        print(json.dumps(result, indent=2))
+        return
+
+    port = ReplayPort(frames, args.speed)
+    path = port.start()
+    if args.drive:
+        result = asyncio.run(drive(port, path, frames, args.speed))
+        result['missed'] = port.missed
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f'Serving on {path}', flush=True)
+    try:
+        port.done.wait()
+    except KeyboardInterrupt:
+        pass
+    if port.missed:
+        print(f'Commands not sent by the client: {port.missed}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Confirmed set commands and their echoes against the emulated receiver."""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+pytest.importorskip('serial_asyncio_fast')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import component  # noqa: E402
+from emulator import Denon232Emulator  # noqa: E402
+
+receiver_module = component.load('denon232_receiver')
+
+def dropping_emulator(drops):
+    """Return an emulator ignoring each command in drops the given number of times, and its port."""
+    emulator = Denon232Emulator(zones=('Z2',), latency=0.01, pace=False)
+    handle = emulator._command_received
+
+    def command_received(client, cmd):
+        if drops.get(cmd):
+            drops[cmd] -= 1
+            return
+        handle(client, cmd)
+
+    emulator._command_received = command_received
+    return emulator, emulator.start_pty()
+
+def run(emulator, path, scenario):
+    """Run scenario with a connected receiver confirming its commands."""
+    async def main():
+        receiver = receiver_module.AsyncDenon232Receiver(path, zones=['Z2'], confirm_timeout=0.2)
+        await receiver.connect()
+        try:
+            await receiver.serial_command('PWON')
+            return await scenario(receiver)
+        finally:
+            receiver.close()
+            emulator.close()
+
+    return asyncio.run(main())
+
+def test_echo_of_earlier_command_does_not_confirm_dropped_command():
+    emulator, path = dropping_emulator({'SICD': 1})
+
+    async def scenario(receiver):
+        results = await asyncio.gather(receiver.serial_command('SIDVD'), receiver.serial_command('SICD'))
+        return results, receiver.stats.confirm_misses, receiver.state.source
+
+    results, misses, source = run(emulator, path, scenario)
+    assert results == [True, True]
+    # The dropped SICD was noticed, queried and sent again. Dropped commands
+    # don't show up in received.
+    assert misses == 1
+    assert emulator.received[-3:] == ['SIDVD', 'SI?', 'SICD']
+    assert source == emulator.state['source'] == 'CD'
+
+def test_unconfirmed_command_gives_up_with_receiver_state():
+    emulator, path = dropping_emulator({'SIDVD': 10})
+
+    async def scenario(receiver):
+        return await receiver.serial_command('SIDVD'), receiver.stats.unconfirmed, receiver.state.source
+
+    assert run(emulator, path, scenario) == (False, 1, 'CD')
+
+def test_clamped_volume_is_confirmed():
+    emulator, path = dropping_emulator({})
+
+    async def scenario(receiver):
+        return await receiver.serial_command('MV90'), receiver.stats.confirm_misses, receiver.state.volume
+
+    assert run(emulator, path, scenario) == (True, 0, 80)
+
+def test_only_latest_coalesced_volume_command_verifies():
+    emulator, path = dropping_emulator({'MV49': 1})
+
+    async def scenario(receiver):
+        results = await asyncio.gather(*(receiver.serial_command(f'MV{volume}') for volume in range(30, 50)))
+        return results, receiver.stats.confirm_misses, receiver.state.volume
+
+    results, misses, volume = run(emulator, path, scenario)
+    assert all(results)
+    assert misses == 1
+    assert emulator.received.count('MV?') == 1
+    assert emulator.received[-2:] == ['MV?', 'MV49']
+    assert volume == emulator.state['volume'] == 49
+
+def test_connect_does_not_wait_for_echo():
+    emulator, path = dropping_emulator({'PWSTANDBY': 1})
+
+    async def main():
+        receiver = receiver_module.AsyncDenon232Receiver(path, zones=['Z2'], confirm_timeout=0.2)
+        started = time.monotonic()
+        await receiver.connect()
+        elapsed = time.monotonic() - started
+        receiver.close()
+        emulator.close()
+        return elapsed, receiver.stats.confirm_misses
+
+    elapsed, misses = asyncio.run(main())
+    assert elapsed < 0.2
+    assert misses == 0
+
+def test_only_changes_made_elsewhere_count_as_push():
+    emulator, path = dropping_emulator({})
+
+    async def scenario(receiver):
+        await receiver.serial_command('SIDVD')
+        await asyncio.sleep(0.05)
+        after_command = receiver.last_push
+        emulator.push('MUON')
+        await asyncio.sleep(0.05)
+        return after_command, receiver.last_push, receiver.state.muted
+
+    after_command, last_push, muted = run(emulator, path, scenario)
+    # The echoes of the commands, PWSTANDBY's arriving after PWON was sent, don't count
+    assert after_command is None
+    assert last_push is not None
+    assert muted
@@ -0,0 +1,33 @@
+"""Link statistic sensors against a coordinator in Home Assistant."""
+import os
+import sys
+from unittest.mock import Mock
+
+import pytest
+
+pytest.importorskip('pytest_homeassistant_custom_component')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import component  # noqa: E402
+from pytest_homeassistant_custom_component.common import MockConfigEntry  # noqa: E402
+
+coordinator_module = component.load('coordinator')
+receiver_module = component.load('denon232_receiver')
+sensor_module = component.load('sensor')
+
+async def test_refresh_without_state_change_updates_link_sensor(hass):
+    entry = MockConfigEntry(domain='denon232', title='Denon')
+    entry.add_to_hass(hass)
+    # Never connected, so the refresh leaves the state as it is
+    receiver = receiver_module.AsyncDenon232Receiver('unused', zones=[])
+    coordinator = coordinator_module.Denon232Coordinator(hass, entry, receiver)
+    sensor = sensor_module.Denon232LinkSensor('Denon', 'denon', coordinator, sensor_module.SENSORS[0])
+    sensor.async_write_ha_state = Mock()
+    coordinator.async_add_listener(sensor._handle_coordinator_update)
+
+    await coordinator.async_refresh()
+    await coordinator.async_refresh()
+
+    assert coordinator.data is receiver.state
+    assert sensor.async_write_ha_state.call_count == 2
@@ -0,0 +1,62 @@
+"""Status line parser and state models."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import component  # noqa: E402
+
+protocol_module = component.load('denon232_protocol')
+state_module = component.load('denon232_state')
+
+StatusUpdate = protocol_module.StatusUpdate
+
+@pytest.mark.parametrize('line, expected', [
+    ('PWON', StatusUpdate('PW?', None, {'power': 'PWON'})),
+    ('PWSTANDBY', StatusUpdate('PW?', None, {'power': 'PWSTANDBY'})),
+    ('MV45', StatusUpdate('MV?', None, {'volume': 45})),
+    ('MV455', StatusUpdate('MV?', None, {'volume': 45})),
+    ('MV99', StatusUpdate('MV?', None, {'volume': 0})),
+    ('MVMAX 80', StatusUpdate('MV?', None, {'volume_max': 80})),
+    ('MUON', StatusUpdate('MU?', None, {'muted': True})),
+    ('MUOFF', StatusUpdate('MU?', None, {'muted': False})),
+    ('SICD', StatusUpdate('SI?', None, {'source': 'CD'})),
+    ('MSSTEREO', StatusUpdate('MS?', None, {'sound_mode': 'STEREO'})),
+    ('Z2ON', StatusUpdate('Z2?', 'Z2', {'power': 'ON'})),
+    ('Z230', StatusUpdate('Z2?', 'Z2', {'volume': 30})),
+    ('Z2TUNER', StatusUpdate('Z2?', 'Z2', {'source': 'TUNER'})),
+    ('Z1OFF', StatusUpdate('Z1?', 'Z1', {'power': 'OFF'})),
+])
+def test_parse_line(line, expected):
+    assert protocol_module.parse_line(line) == expected
+
+@pytest.mark.parametrize('line', [
+    'XX12',  # Unknown family
+    'TPA1',  # Known to the unit, not kept in the state
+    'PW',  # No value
+    'PW?',  # Query
+    'MVUP',  # Relative volume
+    'MVMAX',
+    'MUMAYBE',
+    'Z2DOWN',
+    '',
+])
+def test_parse_line_without_update(line):
+    assert protocol_module.parse_line(line) is None
+
+def test_zone_3_answering_as_z1_counts_once():
+    assert protocol_module.zones_from_replies({'Z2?': ['Z2ON'], 'Z3?': [], 'Z1?': ['Z1OFF']}) == ['Z2', 'Z1']
+    assert protocol_module.zones_from_replies({'Z3?': ['Z3ON'], 'Z1?': ['Z1ON']}) == ['Z3']
+
+def test_apply_returns_only_changed_fields():
+    state = state_module.MainState(['Z2'])
+    assert state.apply({'power': 'PWON', 'volume': 0, 'source': 'CD'}) == {'power', 'source'}
+    assert state.apply({'power': 'PWON', 'source': 'CD'}) == set()
+    assert state.as_dict()['power'] == 'PWON'
+
+    zone = state.zones['Z2']
+    assert zone.apply({'power': 'OFF', 'volume': 25}) == {'volume'}
+    assert zone.apply({'volume': 25}) == set()
+    assert state.as_dict()['zones'] == {'Z2': {'power': 'OFF', 'volume': 25, 'source': ''}}
@@ -0,0 +1,60 @@
+"""Coalesced volume commands."""
+import asyncio
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('serial_asyncio_fast')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import component  # noqa: E402
+from emulator import Denon232Emulator  # noqa: E402
+
+receiver_module = component.load('denon232_receiver')
+
+@pytest.mark.parametrize('cmd, expected', [
+    ('MV45', ('MV', 'MV45')),
+    ('MVUP', ('MV', 'MV41')),
+    ('MVDOWN', ('MV', 'MV39')),
+    ('Z2UP', ('Z2', 'Z221')),
+    ('Z2DOWN', ('Z2', 'Z219')),
+    ('Z3UP', None),
+    ('MVMAX', None),
+    ('SICD', None),
+])
+def test_absolute_volume_command(cmd, expected):
+    receiver = receiver_module.AsyncDenon232Receiver('unused', zones=['Z2'])
+    receiver.state.volume = 40
+    receiver.state.zones['Z2'].volume = 20
+    assert receiver._absolute_volume_command(cmd) == expected
+
+def test_relative_steps_stay_within_range():
+    receiver = receiver_module.AsyncDenon232Receiver('unused', zones=['Z2'])
+    receiver.state.volume = receiver.state.volume_max
+    receiver.state.zones['Z2'].volume = 0
+    assert receiver._absolute_volume_command('MVUP') == ('MV', f'MV{receiver.state.volume_max}')
+    assert receiver._absolute_volume_command('Z2DOWN') == ('Z2', 'Z200')
+
+def test_queued_steps_are_sent_as_one_command():
+    emulator = Denon232Emulator(zones=('Z2',), latency=0.01, pace=False)
+    path = emulator.start_pty()
+
+    async def main():
+        receiver = receiver_module.AsyncDenon232Receiver(path, zones=['Z2'])
+        await receiver.connect()
+        try:
+            await receiver.serial_command('MV40')
+            # Each step folds into the command still waiting in the queue
+            results = await asyncio.gather(*(receiver.serial_command('MVUP') for _ in range(5)))
+            await asyncio.sleep(0.05)
+            return results, receiver.state.volume
+        finally:
+            receiver.close()
+            emulator.close()
+
+    results, volume = asyncio.run(main())
+    assert results == [None] * 5
+    assert [cmd for cmd in emulator.received if cmd.startswith('MV')] == ['MV40', 'MV45']
+    assert volume == emulator.state['volume'] == 45